@@ -1,11 +1,14 @@
-import re
-
-from ros_introspection.resource_list import MESSAGES, SERVICES
+from ros_introspection.resource_list import get_messages, get_services
 
 from roscompile.util import convert_to_caps_notation, convert_to_underscore_notation
 
+from .message_matcher import MessageMatcher
+
 ROS2_INCLUDE_PATTERN = '#include <%s/%s/%s.hpp>'
 
+# Built the first time it is needed, since it covers every message and service
+MESSAGE_MATCHER = None
+
 LOGGERS = {
     'ROS_DEBUG': 'RCLCPP_DEBUG',
     'ROS_INFO': 'RCLCPP_INFO',
@@ -62,13 +65,21 @@ CPP_CODE_REPLACEMENTS = {
 }
 
 
+def get_message_matcher():
+    global MESSAGE_MATCHER
+    if MESSAGE_MATCHER is None:
+        generators = [(pkg, name, 'msg') for pkg, name in get_messages()]
+        generators += [(pkg, name, 'srv') for pkg, name in get_services()]
+        MESSAGE_MATCHER = MessageMatcher(generators)
+    return MESSAGE_MATCHER
+
+
 def get_full_msg_dependencies_from_source(package):
+    """Find the messages and services used in the source, i.e. lines with the package name followed by the name."""
+    matcher = get_message_matcher()
     messages = set()
-    for gen_type, full_list in [('msg', MESSAGES), ('srv', SERVICES)]:
-        for pkg, gen_name in full_list:
-            gen_pattern = re.compile(pkg + '.*' + gen_name)
-            if package.source_code.search_for_pattern(gen_pattern):
-                messages.add((pkg, gen_name, gen_type))
+    for source in package.source_code.sources.values():
+        messages.update(matcher.search(source.iter_lines()))
     return messages
 
 
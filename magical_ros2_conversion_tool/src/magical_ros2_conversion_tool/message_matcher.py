@@ -0,0 +1,92 @@
+import collections
+
+
+class AhoCorasick:
+    """Finds every (possibly overlapping) occurrence of a set of strings in a single pass over a piece of text."""
+
+    def __init__(self, words):
+        # The trie is stored as parallel lists indexed by node, with node 0 as the root
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+        for word in words:
+            node = 0
+            for c in word:
+                if c not in self.transitions[node]:
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.transitions[node][c] = len(self.transitions) - 1
+                node = self.transitions[node][c]
+            if word not in self.outputs[node]:
+                self.outputs[node].append(word)
+
+        # Breadth first, so each node's failure link points at a node that is already complete
+        queue = collections.deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, child in self.transitions[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and c not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.transitions[fallback].get(c, 0)
+                self.outputs[child] += self.outputs[self.fail[child]]
+
+    def iter_matches(self, text):
+        """Yield (start, word) for each occurrence of each word in the text, ordered by where they end."""
+        transitions = self.transitions
+        fail = self.fail
+        outputs = self.outputs
+        node = 0
+        for i, c in enumerate(text):
+            while node and c not in transitions[node]:
+                node = fail[node]
+            node = transitions[node].get(c, 0)
+            if outputs[node]:
+                end = i + 1
+                for word in outputs[node]:
+                    yield end - len(word), word
+
+
+class MessageMatcher:
+    """Finds which messages/services are referenced in source code.
+
+    A message is referenced if a line contains its package name followed (anywhere later on the same line)
+    by its name, i.e. the line matches the regex pkg + '.*' + name
+    """
+
+    def __init__(self, generators):
+        """generators is an iterable of (pkg, name, gen_type) tuples."""
+        self.definitions = collections.defaultdict(list)
+        packages = set()
+        for pkg, name, gen_type in generators:
+            self.definitions[name].append((pkg, gen_type))
+            packages.add(pkg)
+        self.packages = packages
+        self.automaton = AhoCorasick(sorted(packages | set(self.definitions)))
+
+    def search_line(self, line):
+        package_ends = {}
+        name_starts = {}
+        for start, word in self.automaton.iter_matches(line):
+            if word in self.packages and word not in package_ends:
+                package_ends[word] = start + len(word)
+            if word in self.definitions:
+                # Matches are found in order, so this keeps the last start for each name
+                name_starts[word] = start
+
+        matches = set()
+        for name, start in name_starts.items():
+            for pkg, gen_type in self.definitions[name]:
+                if package_ends.get(pkg, start + 1) <= start:
+                    matches.add((pkg, name, gen_type))
+        return matches
+
+    def search(self, lines):
+        """Return the set of (pkg, name, gen_type) referenced in the lines."""
+        matches = set()
+        for line in lines:
+            matches.update(self.search_line(line))
+        return matches
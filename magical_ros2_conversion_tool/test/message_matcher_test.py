@@ -0,0 +1,71 @@
+import random
+import re
+
+from magical_ros2_conversion_tool.message_matcher import AhoCorasick, MessageMatcher
+
+GENERATORS = [
+    ('std_msgs', 'String', 'msg'),
+    ('std_msgs', 'Header', 'msg'),
+    ('std_msgs', 'Empty', 'msg'),
+    ('std_srvs', 'Empty', 'srv'),
+    ('std_srvs', 'Trigger', 'srv'),
+    ('geometry_msgs', 'Pose', 'msg'),
+    ('geometry_msgs', 'PoseStamped', 'msg'),
+    ('geometry_msgs', 'Point', 'msg'),
+    ('nav_msgs', 'Path', 'msg'),
+    ('msgs', 'Point', 'msg'),
+    ('sensor_msgs', 'Image', 'msg'),
+    ('my_msgs', 'msgs', 'msg'),
+]
+
+
+def regex_search(generators, lines):
+    """The original search, with a regex for each message run on each line."""
+    matches = set()
+    for pkg, name, gen_type in generators:
+        pattern = re.compile(pkg + '.*' + name)
+        for line in lines:
+            if pattern.search(line):
+                matches.add((pkg, name, gen_type))
+                break
+    return matches
+
+
+def test_aho_corasick():
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+    assert list(automaton.iter_matches('ushers')) == [(1, 'she'), (2, 'he'), (2, 'hers')]
+    assert list(automaton.iter_matches('hehe')) == [(0, 'he'), (2, 'he')]
+    assert list(automaton.iter_matches('')) == []
+
+
+def test_matcher_examples():
+    matcher = MessageMatcher(GENERATORS)
+    lines = [
+        '#include <geometry_msgs/PoseStamped.h>',  # Pose is a prefix of PoseStamped
+        'void cb(const std_msgs::String::ConstPtr& a, const std_msgs::Header& b);',
+        'Empty std_srvs Trigger',  # The name has to come after the package
+        'my_msgs::msgs msgs',  # Package names inside of other package names and names
+        'Path nav_msgs',
+        'sensor_msgs Image sensor_msgs Image',
+    ]
+    for line in lines:
+        assert matcher.search([line]) == regex_search(GENERATORS, [line]), line
+    assert matcher.search(lines) == regex_search(GENERATORS, lines)
+    assert ('geometry_msgs', 'Pose', 'msg') in matcher.search(lines[:1])
+    assert ('std_srvs', 'Empty', 'srv') not in matcher.search(lines[2:3])
+    assert ('nav_msgs', 'Path', 'msg') not in matcher.search(lines[4:5])
+    assert matcher.search([]) == set()
+
+
+def test_matcher_matches_regex():
+    rng = random.Random(0)
+    words = sorted(set([w for pkg, name, gen_type in GENERATORS for w in (pkg, name)]))
+    separators = ['', ' ', '::', '/', '_', '.h>', 'x']
+    matcher = MessageMatcher(GENERATORS)
+    for _ in range(2000):
+        pieces = []
+        for _ in range(rng.randint(0, 8)):
+            pieces.append(rng.choice(words))
+            pieces.append(rng.choice(separators))
+        line = ''.join(pieces)
+        assert matcher.search([line]) == regex_search(GENERATORS, [line]), line
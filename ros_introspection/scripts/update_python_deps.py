@@ -0,0 +1,13 @@
+#!/usr/bin/python
+
+import argparse
+
+from ros_introspection.resource_list import PY_DEP_INDEX_FILENAME, PY_DEP_URL, update_python_deps
+
+parser = argparse.ArgumentParser(description='Update the list of python rosdep keys used to find python dependencies')
+parser.add_argument('source', nargs='?',
+                    help='A rosdep python.yaml file or rosdistro checkout to use instead of downloading ' + PY_DEP_URL)
+args = parser.parse_args()
+
+deps = update_python_deps(args.source)
+print('Saved %d python rosdep keys from %s to %s' % (len(deps.rosdep_keys), deps.source, PY_DEP_INDEX_FILENAME))
@@ -1,9 +1,16 @@
 import collections
 import re
 
-VARIABLE_PATTERN = re.compile(r'\$\{([^\}]+)\}')
+from .file_writer import write_if_changed
+
 QUOTED_PATTERN = re.compile(r'"([^"]+)"')
 
+# The commands that the variable table is compiled from
+VARIABLE_COMMANDS = ['set', 'project']
+
+# Incremented whenever a Command or Section is marked as changed, so cached variable tables can tell they are stale
+MODIFICATION_COUNT = [0]
+
 BUILD_TARGET_COMMANDS = ['add_library', 'add_executable', 'add_rostest',
                          'target_include_directories', 'add_dependencies', 'target_link_libraries',
                          'set_target_properties', 'ament_target_dependencies']
@@ -20,6 +27,7 @@ BASE_ORDERING = ['cmake_minimum_required', 'project', 'set_directory_properties'
                  'ament_target_dependencies', 'ament_export_include_directories', 'ament_export_libraries',
                  'ament_export_dependencies',
                  'ament_package']
+BUILD_TARGET_INDEXES = {command_name: i for i, command_name in enumerate(BUILD_TARGET_COMMANDS)}
 
 
 def get_style(cmake):
@@ -63,7 +71,27 @@ def get_ordering(style):
         return BASE_ORDERING + TEST_COMMANDS + INSTALL_COMMANDS
 
 
-def get_ordering_index(command_name, ordering):
+def get_ordering_indexes(ordering):
+    """Return a dictionary mapping each of the command names in the ordering to its index (see get_ordering_index)."""
+    indexes = {}
+    for i, o in enumerate(ordering):
+        for command_name in (o if isinstance(o, list) else [o]):
+            indexes.setdefault(command_name, i)
+    return indexes
+
+
+ORDERING_INDEXES = {}
+
+
+def get_ordering_and_indexes(style):
+    """Return the ordering for the style, and its ordering indexes (which are only computed once per style)."""
+    ordering = get_ordering(style)
+    if style not in ORDERING_INDEXES:
+        ORDERING_INDEXES[style] = get_ordering_indexes(ordering)
+    return ordering, ORDERING_INDEXES[style]
+
+
+def get_ordering_index(command_name, ordering, indexes=None):
     """
     Given a command name, determine the integer index into the ordering.
 
@@ -75,19 +103,20 @@ def get_ordering_index(command_name, ordering):
     If the command name matches one of the other strings, its index is returned.
 
      Otherwise, the length of the ordering is returned (putting non-matches at the end)
+
+    The optional indexes parameter is the result of get_ordering_indexes(ordering), to avoid searching the ordering.
     """
-    for i, o in enumerate(ordering):
-        if type(o) == list:
-            if command_name in o:
-                return i
-        elif command_name == o:
-            return i
+    if indexes is None:
+        indexes = get_ordering_indexes(ordering)
+    index = indexes.get(command_name)
+    if index is not None:
+        return index
     if command_name:
         print('\tUnsure of ordering for ' + str(command_name))
     return len(ordering)
 
 
-def get_sort_key(content, anchors, ordering):
+def get_sort_key(content, anchors, ordering, indexes=None):
     """
     Given a piece of cmake content, return a tuple representing its sort_key.
 
@@ -95,9 +124,10 @@ def get_sort_key(content, anchors, ordering):
     The second element is an additional variable used for sorting among elements with the same ordering_index
 
     Most notably, we want all build commands with a particular library/executable to be grouped together.
-    In that case, we use the anchors parameter, which is an ordered list of all the library/executables in the file.
-    Then, the second variable is a tuple itself, with the first element being the index of library/executable in the
-    anchors list, and the second is an integer representing the canonical order of the build commands.
+    In that case, we use the anchors parameter, which is a dictionary mapping each of the library/executables in
+    the file to its index in the file. Then, the second variable is a tuple itself, with the first element being the
+    index of library/executable in the anchors, and the second is an integer representing the canonical order of the
+    build commands.
     """
     if content is None:
         return len(ordering) + 1, None
@@ -110,20 +140,22 @@ def get_sort_key(content, anchors, ordering):
                 continue
             key_token = token
             break
-        index = get_ordering_index(('group', key_token), ordering)
+        index = get_ordering_index(('group', key_token), ordering, indexes)
     else:  # Command
-        index = get_ordering_index(content.command_name, ordering)
-        if content.command_name in BUILD_TARGET_COMMANDS:
+        index = get_ordering_index(content.command_name, ordering, indexes)
+        if content.command_name in BUILD_TARGET_INDEXES:
             token = content.first_token()
             if token not in anchors:
-                anchors.append(token)
-            key = anchors.index(token), BUILD_TARGET_COMMANDS.index(content.command_name)
+                anchors[token] = len(anchors)
+            key = anchors[token], BUILD_TARGET_INDEXES[content.command_name]
         elif content.command_name == 'include_directories' and 'include_directories' in anchors:
-            key = -1, anchors.index('include_directories')
+            key = -1, anchors['include_directories']
     return index, key
 
 
-class SectionStyle:
+class SectionStyle(object):
+    __slots__ = ['prename', 'name_val_sep', 'val_sep']
+
     def __init__(self, prename='', name_val_sep=' ', val_sep=' '):
         self.prename = prename
         self.name_val_sep = name_val_sep
@@ -133,8 +165,11 @@ class SectionStyle:
         return 'SectionStyle(%s, %s, %s)' % (repr(self.prename), repr(self.name_val_sep), repr(self.val_sep))
 
 
-class Section:
+class Section(object):
+    __slots__ = ['name', 'values', 'style', '_changed']
+
     def __init__(self, name='', values=None, style=None):
+        self.changed = False
         self.name = name
         if values is None:
             self.values = []
@@ -145,8 +180,19 @@ class Section:
         else:
             self.style = SectionStyle()
 
+    @property
+    def changed(self):
+        return self._changed
+
+    @changed.setter
+    def changed(self, value):
+        self._changed = value
+        if value:
+            MODIFICATION_COUNT[0] += 1
+
     def add(self, v):
         self.values.append(v)
+        self.changed = True
 
     def add_values(self, new_values, alpha_order=True):
         """Add the new_values to the values.
@@ -160,6 +206,7 @@ class Section:
             self.values = sorted(all_values)
         else:
             self.values += sorted(new_values)
+        self.changed = True
 
     def is_valid(self):
         return len(self.name) > 0 or len(self.values) > 0
@@ -174,14 +221,44 @@ class Section:
         return s
 
 
-class Command:
+class Command(object):
+    __slots__ = ['command_name', 'source', 'start', 'end', '_changed', 'pre_paren', 'sections']
+
     def __init__(self, command_name):
         self.command_name = command_name
-        self.original = None
+        self.source = None
+        self.start = 0
+        self.end = 0
         self.changed = False
         self.pre_paren = ''
         self.sections = []
 
+    def set_source(self, source, start, end):
+        """Set the original text of the command to source[start:end], without copying it out of the source."""
+        self.source = source
+        self.start = start
+        self.end = end
+
+    @property
+    def changed(self):
+        return self._changed
+
+    @changed.setter
+    def changed(self, value):
+        self._changed = value
+        if value:
+            MODIFICATION_COUNT[0] += 1
+
+    @property
+    def original(self):
+        if self.source is None:
+            return None
+        return self.source[self.start:self.end]
+
+    @original.setter
+    def original(self, value):
+        self.set_source(value, 0, len(value) if value is not None else 0)
+
     def get_real_sections(self):
         return [s for s in self.sections if type(s) != str]
 
@@ -232,28 +309,50 @@ class Command:
             last.values.append(s)
         self.changed = True
 
+    def is_changed(self):
+        """Return whether the command needs to be regenerated, rather than using its original text."""
+        if self.changed or not self.source or self.end <= self.start:
+            return True
+        for section in self.sections:
+            if type(section) != str and section.changed:
+                return True
+        return False
+
     def __repr__(self):
-        if self.original and not self.changed:
-            return self.original
+        if not self.is_changed():
+            return self.source[self.start:self.end]
 
-        s = self.command_name + self.pre_paren + '('
+        pieces = [self.command_name, self.pre_paren, '(']
+        last_char = '('
+        multiline = False
         for section in map(str, self.sections):
-            if s[-1] not in '( \n' and section[0] not in ' \n':
-                s += ' '
-            s += section
-        if '\n' in s and s[-1] != '\n':
-            s += '\n'
-        s += ')'
-        return s
+            if last_char not in '( \n' and section[0] not in ' \n':
+                pieces.append(' ')
+            if section:
+                pieces.append(section)
+                last_char = section[-1]
+                multiline = multiline or '\n' in section
+        if multiline and last_char != '\n':
+            pieces.append('\n')
+        pieces.append(')')
+        return ''.join(pieces)
+
 
+class CommandGroup(object):
+    __slots__ = ['initial_tag', 'sub', 'close_tag']
 
-class CommandGroup:
     def __init__(self, initial_tag, sub, close_tag):
         self.initial_tag = initial_tag
         self.sub = sub
         self.close_tag = close_tag
 
+    def is_changed(self):
+        return self.initial_tag.is_changed() or self.close_tag.is_changed() or self.sub.is_changed()
+
     def __repr__(self):
+        if self.initial_tag.source is self.close_tag.source and not self.is_changed():
+            # Everything from the start of the initial tag to the end of the close tag is unchanged
+            return self.initial_tag.source[self.initial_tag.start:self.close_tag.end]
         return str(self.initial_tag) + str(self.sub) + str(self.close_tag)
 
 
@@ -263,12 +362,15 @@ def is_testing_group(content):
 
 
 class CMake:
-    def __init__(self, file_path=None, initial_contents=None, depth=0):
+    def __init__(self, file_path=None, initial_contents=None, depth=0, source=None):
         self.file_path = file_path
         if initial_contents is None:
             self.contents = []
         else:
             self.contents = initial_contents
+        # The text the contents were parsed from (if any) and the original contents, used to detect changes
+        self.source = source
+        self.original_contents = list(self.contents)
         self.content_map = collections.defaultdict(list)
         for content in self.contents:
             if content.__class__ == Command:
@@ -277,57 +379,153 @@ class CMake:
                 self.content_map['group'].append(content)
         self.depth = depth
 
-        self.variables = {}
-        for cmd in self.content_map['set']:
-            tokens = cmd.get_tokens(include_name=True)
-            self.variables[tokens[0]] = ' '.join(tokens[1:])
-        self.variables['PROJECT_NAME'] = self.get_project_name()
+        # The variable table is compiled from the set commands when first needed (see refresh_variables)
+        self.variables_dirty = True
+        self.variables_modification_count = None
+        self.variable_signature = None
+        self.variable_table = {}
+        self.variable_values = {}
+        self.resolved_tokens = {}
+        self.cycle_count = 0
 
         self.existing_style = get_style(self)
 
     def get_project_name(self):
-        project_tags = self.content_map['project']
+        project_tags = self.content_map.get('project')
         if not project_tags:
             return ''
         # Get all tokens just in case the name is all caps
         return project_tags[0].get_tokens(include_name=True)[0]
 
+    def get_variable_signature(self):
+        set_tokens = tuple(tuple(cmd.get_tokens(include_name=True)) for cmd in self.content_map.get('set', []))
+        return set_tokens, self.get_project_name()
+
+    def refresh_variables(self):
+        """Compile the table of variables from the set commands, unless they haven't changed since the last time.
+
+        Nothing is checked unless a set/project command was added or removed (see add_command and remove_command)
+        or a command or section was marked as changed since the last time. Even then, the table is only compiled
+        again (and the cached variable values and resolved tokens cleared) if the set/project commands differ.
+        """
+        if not self.variables_dirty and self.variables_modification_count == MODIFICATION_COUNT[0]:
+            return
+        self.variables_dirty = False
+        self.variables_modification_count = MODIFICATION_COUNT[0]
+        signature = self.get_variable_signature()
+        if signature == self.variable_signature:
+            return
+        self.variable_signature = signature
+        set_tokens, project_name = signature
+        self.variable_table = {}
+        for tokens in set_tokens:
+            if tokens:
+                self.variable_table[tokens[0]] = ' '.join(tokens[1:])
+        self.variable_table['PROJECT_NAME'] = project_name
+        self.variable_values = {}
+        self.resolved_tokens = {}
+
+    @property
+    def variables(self):
+        self.refresh_variables()
+        return self.variable_table
+
+    def get_variable_value(self, name, stack=()):
+        """Return the fully resolved value of the variable, or None if it is not defined (or defined recursively).
+
+        Values are cached, except for the ones whose definitions (directly or indirectly) refer back to a variable
+        being resolved. Those depend on which variable the resolution started from, so they are always recomputed.
+        """
+        if name in stack:
+            self.cycle_count += 1
+            return None
+        if name in self.variable_values:
+            return self.variable_values[name]
+        if name not in self.variable_table:
+            return None
+        cycle_count = self.cycle_count
+        value = self.expand_variables(self.variable_table[name], stack + (name,))
+        if self.cycle_count == cycle_count:
+            self.variable_values[name] = value
+        return value
+
+    def expand_variables(self, s, stack=(), pos=0, nested=False):
+        """Replace the variable references in s with their values, leaving unknown variables as they are.
+
+        References can be nested, i.e. ${FOO_${BAR}}. When nested is True, s[pos:] is inside of a reference, so
+        this stops at the closing brace and returns the expanded name and the index after the closing brace
+        (or None, None if it is never closed).
+        """
+        pieces = []
+        start = pos
+        while True:
+            next_ref = s.find('${', pos)
+            next_close = s.find('}', pos) if nested else -1
+            if nested and next_close >= 0 and (next_ref < 0 or next_close < next_ref):
+                pieces.append(s[start:next_close])
+                return ''.join(pieces), next_close + 1
+            if next_ref < 0:
+                break
+            name, end = self.expand_variables(s, stack, next_ref + 2, True)
+            if end is None:
+                break
+            value = self.get_variable_value(name, stack)
+            pieces.append(s[start:next_ref])
+            pieces.append(value if value is not None else '${%s}' % name)
+            pos = start = end
+        if nested:
+            return None, None
+        pieces.append(s[start:])
+        return ''.join(pieces)
+
+    def resolve_token(self, token):
+        """Return the list of strings the token resolves to (empty for comments). The results are cached."""
+        if token not in self.resolved_tokens:
+            if token and token[0] == '#':
+                resolved = []
+            else:
+                m = QUOTED_PATTERN.match(token)
+                value = m.group(1) if m else token
+                if '${' in value:
+                    value = self.expand_variables(value)
+                resolved = value.split(' ')
+            self.resolved_tokens[token] = resolved
+        return self.resolved_tokens[token]
+
     def resolve_variables(self, var):
+        self.refresh_variables()
         if type(var) == str:
-            s = var
-            m = VARIABLE_PATTERN.search(s)
-            if not m:
-                return s
-
-            for k, v in self.variables.items():
-                s = s.replace('${%s}' % k, v)
-            return s
+            if '${' not in var:
+                return var
+            return self.expand_variables(var)
         else:
             tokens = []
             for token in var:
-                if token and token[0] == '#':
-                    continue
-                m = QUOTED_PATTERN.match(token)
-                if m:
-                    token = m.group(1)
-                token = self.resolve_variables(token)
-                tokens += token.split(' ')
+                tokens += self.resolve_token(token)
             return tokens
 
     def get_resolved_tokens(self, cmd, include_name=False):
         return self.resolve_variables(cmd.get_tokens(include_name))
 
+    def get_anchors(self):
+        """Return a dictionary mapping each of the ordered build targets to its position (for get_sort_key)."""
+        anchors = {}
+        for target in self.get_ordered_build_targets():
+            if target not in anchors:
+                anchors[target] = len(anchors)
+        return anchors
+
     def get_insertion_index(self, cmd):
-        anchors = self.get_ordered_build_targets()
-        ordering = get_ordering(self.get_desired_style())
+        anchors = self.get_anchors()
+        ordering, indexes = get_ordering_and_indexes(self.get_desired_style())
 
-        new_key = get_sort_key(cmd, anchors, ordering)
+        new_key = get_sort_key(cmd, anchors, ordering, indexes)
         i_index = 0
 
         for i, content in enumerate(self.contents):
             if type(content) == str:
                 continue
-            key = get_sort_key(content, anchors, ordering)
+            key = get_sort_key(content, anchors, ordering, indexes)
             if key <= new_key:
                 i_index = i + 1
             elif key[0] != len(ordering):
@@ -352,6 +550,8 @@ class CMake:
 
         if cmd.__class__ == Command:
             self.content_map[cmd.command_name].append(cmd)
+            if cmd.command_name in VARIABLE_COMMANDS:
+                self.variables_dirty = True
         elif cmd.__class__ == CommandGroup:
             self.content_map['group'].append(cmd)
 
@@ -359,6 +559,8 @@ class CMake:
         print('\tRemoving %s' % str(cmd).replace('\n', ' ').replace('  ', ''))
         self.contents.remove(cmd)
         self.content_map[cmd.command_name].remove(cmd)
+        if cmd.command_name in VARIABLE_COMMANDS:
+            self.variables_dirty = True
 
     def remove_all_commands(self, cmd_name):
         cmds = list(self.content_map[cmd_name])
@@ -409,16 +611,18 @@ class CMake:
 
     def get_ordered_build_targets(self):
         targets = []
+        seen = set()
         for content in self.contents:
             if content.__class__ != Command:
                 continue
             if content.command_name == 'include_directories':
                 targets.append('include_directories')
                 continue
-            elif content.command_name not in BUILD_TARGET_COMMANDS:
+            elif content.command_name not in BUILD_TARGET_INDEXES:
                 continue
             token = content.first_token()
-            if token not in targets:
+            if token not in seen:
+                seen.add(token)
                 targets.append(token)
         return targets
 
@@ -494,19 +698,19 @@ class CMake:
         The clusters are sorted according to the desired style.
         The strings are grouped at the beginning to maintain the newlines and indenting before each Command.
         """
-        anchors = self.get_ordered_build_targets()
-        ordering = get_ordering(desired_style)
+        anchors = self.get_anchors()
+        ordering, indexes = get_ordering_and_indexes(desired_style)
         clusters = []
         current = []
         for content in self.contents:
             current.append(content)
             if type(content) == str:
                 continue
-            key = get_sort_key(content, anchors, ordering)
+            key = get_sort_key(content, anchors, ordering, indexes)
             clusters.append((key, current))
             current = []
         if len(current) > 0:
-            clusters.append((get_sort_key(None, anchors, ordering), current))
+            clusters.append((get_sort_key(None, anchors, ordering, indexes), current))
 
         return [kv[1] for kv in sorted(clusters, key=lambda kv: kv[0])]
 
@@ -547,11 +751,27 @@ class CMake:
                 section.values[0] = '.'.join(map(str, new_version))
                 cmd.changed = True
 
+    def is_changed(self):
+        """Return whether any of the contents have been added, removed, reordered or modified since parsing."""
+        if len(self.contents) != len(self.original_contents):
+            return True
+        for content, original in zip(self.contents, self.original_contents):
+            if content is not original and content != original:
+                return True
+            if content.__class__ == Command or content.__class__ == CommandGroup:
+                if content.is_changed():
+                    return True
+        return False
+
     def __repr__(self):
+        if self.source is not None and not self.is_changed():
+            return self.source
         return ''.join(map(str, self.contents))
 
     def write(self, fn=None):
         if fn is None:
             fn = self.file_path
-        with open(fn, 'w') as cmake:
-            cmake.write(str(self))
+        if fn == self.file_path and self.source is not None and not self.is_changed():
+            # The file still matches what was parsed, so don't touch it
+            return False
+        return write_if_changed(fn, str(self))
@@ -1,30 +1,69 @@
+import array
 import os.path
 import re
 import sys
 
 from .cmake import CMake, Command, CommandGroup, Section, SectionStyle
 
-ALL_CAPS = re.compile('^[A-Z_]+$')
-ALL_WHITESPACE = ['whitespace', 'newline']
-NOT_REAL = ALL_WHITESPACE + ['comment']
-
-
-def word_cb(scanner, token):
-    if ALL_CAPS.match(token):
-        return ('caps', token)
-    else:
-        return ('word', token)
+try:
+    from sys import intern
+except ImportError:  # Python 2
+    pass
 
+ALL_CAPS = re.compile('^[A-Z_]+$')
 
-scanner = re.Scanner([
-    (r'#.*\n', lambda scanner, token: ('comment', token)),
-    (r'"[^"]*"', lambda scanner, token: ('string', token)),
-    (r'\(', lambda scanner, token: ('left paren', token)),
-    (r'\)', lambda scanner, token: ('right paren', token)),
-    (r'[^ \t\r\n()#"]+', word_cb),
-    (r'\n', lambda scanner, token: ('newline', token)),
-    (r'[ \t]+', lambda scanner, token: ('whitespace', token)),
-])
+# Token types, in the same order as the groups in TOKEN_PATTERN (plus caps, which are words that are all caps)
+COMMENT, STRING, LEFT_PAREN, RIGHT_PAREN, WORD, NEWLINE, WHITESPACE, CAPS = range(8)
+TOKEN_NAMES = ['comment', 'string', 'left paren', 'right paren', 'word', 'newline', 'whitespace', 'caps']
+TOKEN_PATTERN = re.compile('|'.join([
+    r'(#.*\n)',
+    r'("[^"]*")',
+    r'(\()',
+    r'(\))',
+    r'([^ \t\r\n()#"]+)',
+    r'(\n)',
+    r'([ \t]+)',
+]))
+# Tokens of these types repeat a lot within (and across) files, so only one copy of each is kept
+INTERNED_TYPES = (NEWLINE, WHITESPACE, CAPS)
+
+ALL_WHITESPACE = (WHITESPACE, NEWLINE)
+NOT_REAL = ALL_WHITESPACE + (COMMENT,)
+
+
+def get_token_name(typ):
+    if typ is None:
+        return None
+    return TOKEN_NAMES[typ]
+
+
+def tokenize(s):
+    """Split the string into tokens.
+
+    Returns an array of the token types, a list of the token strings, an array of the offsets where each token
+    starts (plus the offset where the last token ends) and any unrecognized remainder of the string.
+    """
+    types = bytearray()
+    texts = []
+    offsets = array.array('l')
+    pos = 0
+    match = TOKEN_PATTERN.match
+    while pos < len(s):
+        m = match(s, pos)
+        if not m:
+            break
+        typ = m.lastindex - 1
+        text = m.group()
+        if typ == WORD and ALL_CAPS.match(text):
+            typ = CAPS
+        if typ in INTERNED_TYPES:
+            text = intern(text)
+        types.append(typ)
+        texts.append(text)
+        offsets.append(pos)
+        pos = m.end()
+    offsets.append(pos)
+    return types, texts, offsets, s[pos:]
 
 
 def match_command_groups(contents, base_depth=0):
@@ -71,28 +110,34 @@ class CMakeParseError(Exception):
 
 class AwesomeParser:
     def __init__(self, s, debug=False):
-        self.tokens, remainder = scanner.scan(s)
+        self.source = s
+        self.types, self.texts, self.offsets, remainder = tokenize(s)
         if remainder != '':
             msg = 'Unrecognized tokens: %s' % (remainder)
             raise ValueError(msg)
 
         if debug:
-            for typ, token in self.tokens:
-                print('[%s]%s' % (typ, repr(token)))
+            for typ, token in zip(self.types, self.texts):
+                print('[%s]%s' % (get_token_name(typ), repr(token)))
+
+        # The tokens are consumed by moving self.index forward, rather than removing them from the lists
+        self.index = 0
+        self.num_tokens = len(self.types)
+        self.next_real_indexes = self.find_next_real_indexes()
 
         self.contents = []
-        while len(self.tokens) > 0:
+        while self.index < self.num_tokens:
             typ = self.get_type()
-            if typ == 'comment':
+            if typ == COMMENT:
                 self.contents.append(self.match(typ))
-            elif typ == 'newline' or typ == 'whitespace':
+            elif typ == NEWLINE or typ == WHITESPACE:
                 s = self.match(typ)
                 self.contents.append(s)
-            elif typ in ['word', 'caps']:
+            elif typ == WORD or typ == CAPS:
                 cmd = self.parse_command()
                 self.contents.append(cmd)
             else:
-                raise Exception('token ' + typ)
+                raise Exception('token ' + get_token_name(typ))
 
         # Match Command Groups
         self.contents = match_command_groups(self.contents)
@@ -101,72 +146,74 @@ class AwesomeParser:
             for chunk in self.contents:
                 print('[%s]' % chunk)
 
+    def find_next_real_indexes(self):
+        """For each token index, find the index of the first token at or after it that is not whitespace/comment."""
+        next_real_indexes = [self.num_tokens] * (self.num_tokens + 1)
+        for i in range(self.num_tokens - 1, -1, -1):
+            if self.types[i] in NOT_REAL:
+                next_real_indexes[i] = next_real_indexes[i + 1]
+            else:
+                next_real_indexes[i] = i
+        return next_real_indexes
+
     def parse_command(self):
+        start_index = self.index
         command_name = self.match()
-        original = command_name
         cmd = Command(command_name)
-        while self.get_type() == 'whitespace':
-            s = self.match('whitespace')
+        while self.get_type() == WHITESPACE:
+            s = self.match(WHITESPACE)
             cmd.pre_paren += s
-            original += s
-        original += self.match('left paren')
+        self.match(LEFT_PAREN)
         paren_depth = 1
 
-        while len(self.tokens) > 0:
+        while self.index < self.num_tokens:
             typ = self.next_real_type()
-            if typ in ['word', 'caps', 'string']:
-                section, s = self.parse_section()
-                cmd.sections.append(section)
-                original += s
+            if typ == WORD or typ == CAPS or typ == STRING:
+                cmd.sections.append(self.parse_section())
             else:
-                typ, tok_contents = self.tokens.pop(0)
-                original += tok_contents
-                if typ == 'right paren':
+                typ = self.types[self.index]
+                tok_contents = self.match()
+                if typ == RIGHT_PAREN:
                     paren_depth -= 1
                     if paren_depth == 0:
-                        cmd.original = original
+                        cmd.set_source(self.source, self.offsets[start_index], self.offsets[self.index])
                         return cmd
-                elif typ == 'left paren':
+                elif typ == LEFT_PAREN:
                     paren_depth += 1
                 else:
                     cmd.sections.append(tok_contents)
         raise CMakeParseError('File ended while processing command "%s"' % (command_name))
 
     def parse_section(self):
-        original = ''
         style = SectionStyle()
         tokens = []
         cat = ''
         while self.get_type() in NOT_REAL:
             s = self.match()
-            original += s
             style.prename += s
 
-        if self.get_type() == 'caps':
-            cat = self.match('caps')
-            original += cat
+        if self.get_type() == CAPS:
+            cat = self.match(CAPS)
             style.name_val_sep = ''
             while self.get_type() in ALL_WHITESPACE:
                 s = self.match()
-                original += s
                 style.name_val_sep += s
             if len(style.name_val_sep) == 0:
                 style.name_val_sep = ' '
+            style.name_val_sep = intern(style.name_val_sep)
 
         delims = set()
         current = ''
-        while self.next_real_type() not in ['left paren', 'right paren', 'caps']:
+        while self.next_real_type() not in (LEFT_PAREN, RIGHT_PAREN, CAPS):
             typ = self.get_type()
             if typ in ALL_WHITESPACE:
                 token = self.match()
-                original += token
                 current += token
             else:
                 if len(current) > 0:
                     delims.add(current)
                 current = ''
                 token = self.match()
-                original += token
                 tokens.append(token)
         if len(current) > 0:
             delims.add(current)
@@ -177,31 +224,34 @@ class AwesomeParser:
                 # TODO: Smarter multi delim parsing
                 # print(delims)
                 style.val_sep = list(delims)[0]
+            style.val_sep = intern(style.val_sep)
 
         # print(cat, tokens, style)
-        return Section(cat, tokens, style), original
+        return Section(cat, tokens, style)
 
     def match(self, typ=None):
         if typ is None or self.get_type() == typ:
-            typ, tok = self.tokens.pop(0)
-            # print('[%s]%s'%(typ, repr(tok)))
+            tok = self.texts[self.index]
+            self.index += 1
+            # print('[%s]%s'%(get_token_name(typ), repr(tok)))
             return tok
         else:
             sys.stderr.write('Token Dump:\n')
-            for a in self.tokens:
+            for a in zip(map(get_token_name, self.types[self.index:]), self.texts[self.index:]):
                 sys.stderr.write(str(a) + '\n')
-            raise CMakeParseError('Expected type "%s" but got "%s"' % (typ, self.get_type()))
+            raise CMakeParseError('Expected type "%s" but got "%s"' % (get_token_name(typ),
+                                                                       get_token_name(self.get_type())))
 
     def get_type(self):
-        if len(self.tokens) > 0:
-            return self.tokens[0][0]
+        if self.index < self.num_tokens:
+            return self.types[self.index]
         else:
             return None
 
     def next_real_type(self):
-        for x, y in self.tokens:
-            if x not in NOT_REAL:
-                return x
+        next_index = self.next_real_indexes[self.index]
+        if next_index < self.num_tokens:
+            return self.types[next_index]
 
 
 def parse_commands(s):
@@ -220,4 +270,4 @@ def parse_file(filename):
         return
     with open(filename) as f:
         s = f.read()
-        return CMake(file_path=filename, initial_contents=parse_commands(s))
+        return CMake(file_path=filename, initial_contents=parse_commands(s), source=s)
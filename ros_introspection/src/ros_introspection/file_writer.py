@@ -0,0 +1,91 @@
+import contextlib
+import os
+import stat
+
+# While capture_writes is active, the changes that would be made to files are stored here instead of being made
+CAPTURED_WRITES = None
+
+
+class CapturedWrites:
+    """The changes that would have been made to files, keyed by path.
+
+    contents maps each path to its new contents (bytes), or to None if the file would be deleted.
+    modes maps each path to its new permission bits.
+    """
+
+    def __init__(self):
+        self.contents = {}
+        self.modes = {}
+
+    def __len__(self):
+        return len(set(self.contents) | set(self.modes))
+
+
+def encode_contents(contents):
+    if isinstance(contents, bytes):
+        return contents
+    return contents.encode('utf-8')
+
+
+def write_if_changed(file_path, contents):
+    """Write the contents to the file, unless the file already contains exactly those bytes.
+
+    Returns whether the file was written. Skipping identical writes leaves the modification time alone,
+    so build tools don't rebuild (and editors don't reload) files that were not really changed.
+    """
+    data = encode_contents(contents)
+    if os.path.isfile(file_path) and os.path.getsize(file_path) == len(data):
+        with open(file_path, 'rb') as f:
+            if f.read() == data:
+                if CAPTURED_WRITES is not None:
+                    # Writing the original contents back undoes an earlier captured change
+                    CAPTURED_WRITES.contents.pop(file_path, None)
+                return False
+    if CAPTURED_WRITES is not None:
+        CAPTURED_WRITES.contents[file_path] = data
+        return True
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def remove_file(file_path):
+    if CAPTURED_WRITES is not None:
+        CAPTURED_WRITES.contents[file_path] = None
+        return
+    os.remove(file_path)
+
+
+def get_mode(file_path):
+    if CAPTURED_WRITES is not None and file_path in CAPTURED_WRITES.modes:
+        return CAPTURED_WRITES.modes[file_path]
+    return stat.S_IMODE(os.lstat(file_path).st_mode)
+
+
+def set_mode(file_path, mode):
+    """Change the permission bits of the file. Returns whether they were changed."""
+    if get_mode(file_path) == mode:
+        return False
+    if CAPTURED_WRITES is not None:
+        if stat.S_IMODE(os.lstat(file_path).st_mode) == mode:
+            CAPTURED_WRITES.modes.pop(file_path, None)
+        else:
+            CAPTURED_WRITES.modes[file_path] = mode
+        return True
+    os.chmod(file_path, mode)
+    return True
+
+
+@contextlib.contextmanager
+def capture_writes():
+    """Within this context, write_if_changed, remove_file and set_mode do not change anything on disk.
+
+    Instead, the yielded CapturedWrites is filled with the changes that would have been made.
+    """
+    global CAPTURED_WRITES
+    previous = CAPTURED_WRITES
+    CAPTURED_WRITES = CapturedWrites()
+    try:
+        yield CAPTURED_WRITES
+    finally:
+        CAPTURED_WRITES = previous
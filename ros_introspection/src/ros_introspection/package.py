@@ -1,10 +1,13 @@
 import collections
+import copy
 
 from .cmake_parser import parse_file
 from .launch import LaunchXML
 from .package_structure import get_package_structure
 from .package_xml import PackageXML
+from .parse_cache import cached_parse
 from .plugin_xml import PluginXML
+from .profiler import measure
 from .ros_generator import ROSGenerator
 from .rviz_config import RVizConfig
 from .setup_py import SetupPy
@@ -12,45 +15,120 @@ from .source_code import SourceCode
 from .urdf import UrdfFile
 
 
+COMPONENTS = ['cmake', 'source_code', 'launches', 'plugin_configs', 'urdf_files', 'setup_py', 'generators',
+              'dynamic_reconfigs', 'rviz_configs', 'misc_files']
+
+
+class lazy_component(object):
+    """Decorator for the Package methods that build each component.
+
+    The method is called the first time the attribute is accessed, and the result is stored on the
+    instance, so later accesses (and assignments, like package.cmake = None) use the attribute directly.
+    """
+
+    def __init__(self, build_fne):
+        self.build_fne = build_fne
+        self.name = build_fne.__name__
+
+    def __get__(self, package, owner=None):
+        if package is None:
+            return self
+        with measure('component', self.name, package.root):
+            value = self.build_fne(package)
+        package.__dict__[self.name] = value
+        return value
+
+
 class Package:
-    def __init__(self, root):
+    def __init__(self, root, filenames=None):
         self.root = root
-        self.manifest = PackageXML(self.root + '/package.xml')
+        self.filenames = filenames
         self.name = self.manifest.name
         self.build_type = self.manifest.build_type
-        self.cmake = parse_file(self.root + '/CMakeLists.txt')
 
-        package_structure = get_package_structure(root)
-        self.source_code = SourceCode(package_structure['source'], self.name)
+    def is_loaded(self, component):
+        return component in self.__dict__
+
+    def load_components(self):
+        """Build all of the components now, instead of on first access."""
+        for component in COMPONENTS:
+            getattr(self, component)
+
+    def snapshot(self):
+        """Return a copy of the package as it is now, for trying out changes without affecting this package.
+
+        The components that this package has already built (including the manifest) are copied now, together,
+        so references between them are kept. The others have not been parsed yet, so they are only parsed
+        (from the files on disk) if the snapshot uses them, and then belong to the snapshot alone.
+        """
+        clone = copy.copy(self)
+        loaded = {key: value for key, value in self.__dict__.items()
+                  if isinstance(getattr(Package, key, None), lazy_component)}
+        clone.__dict__ = {key: value for key, value in self.__dict__.items() if key not in loaded}
+        clone.__dict__.update(copy.deepcopy(loaded))
+        return clone
+
+    @lazy_component
+    def manifest(self):
+        return cached_parse(self.root + '/package.xml', PackageXML, self.root + '/package.xml')
+
+    @lazy_component
+    def package_structure(self):
+        return get_package_structure(self.root, self.filenames)
+
+    @lazy_component
+    def cmake(self):
+        return cached_parse(self.root + '/CMakeLists.txt', parse_file, self.root + '/CMakeLists.txt')
+
+    @lazy_component
+    def source_code(self):
+        source_code = SourceCode(self.package_structure['source'], self.name)
         if self.cmake:
-            self.source_code.setup_tags(self.cmake)
-
-        self.launches = []
-        self.plugin_configs = []
-        self.urdf_files = []
-        for rel_fn, file_path in package_structure['launch'].items():
-            self.launches.append(LaunchXML(rel_fn, file_path))
-        for rel_fn, file_path in package_structure['plugin_config'].items():
-            self.plugin_configs.append(PluginXML(rel_fn, file_path))
-        for rel_fn, file_path in package_structure['urdf'].items():
-            self.urdf_files.append(UrdfFile(rel_fn, file_path))
-
-        self.setup_py = None
-        if 'setup.py' in package_structure['key']:
-            self.setup_py = SetupPy(self.name, package_structure['key']['setup.py'])
-        self.generators = collections.defaultdict(list)
-        for rel_fn, path in package_structure['generators'].items():
-            gen = ROSGenerator(rel_fn, path)
-            self.generators[gen.type].append(gen)
-        self.dynamic_reconfigs = package_structure['cfg'].keys()
-        self.urdf_files = []
-        for rel_fn, path in package_structure['urdf'].items():
-            self.urdf_files.append(UrdfFile(rel_fn, path))
-        self.rviz_configs = []
-        for rel_fn, path in package_structure[None].items():
-            if path.endswith('.rviz'):
-                self.rviz_configs.append(RVizConfig(rel_fn, path))
-        self.misc_files = list(package_structure[None].keys())
+            source_code.setup_tags(self.cmake)
+        return source_code
+
+    @lazy_component
+    def launches(self):
+        return [cached_parse(file_path, LaunchXML, rel_fn, file_path)
+                for rel_fn, file_path in self.package_structure['launch'].items()]
+
+    @lazy_component
+    def plugin_configs(self):
+        return [cached_parse(file_path, PluginXML, rel_fn, file_path)
+                for rel_fn, file_path in self.package_structure['plugin_config'].items()]
+
+    @lazy_component
+    def urdf_files(self):
+        return [cached_parse(file_path, UrdfFile, rel_fn, file_path)
+                for rel_fn, file_path in self.package_structure['urdf'].items()]
+
+    @lazy_component
+    def setup_py(self):
+        if 'setup.py' not in self.package_structure['key']:
+            return None
+        setup_py_path = self.package_structure['key']['setup.py']
+        return cached_parse(setup_py_path, SetupPy, self.name, setup_py_path)
+
+    @lazy_component
+    def generators(self):
+        generators = collections.defaultdict(list)
+        for rel_fn, path in self.package_structure['generators'].items():
+            gen = cached_parse(path, ROSGenerator, rel_fn, path)
+            generators[gen.type].append(gen)
+        return generators
+
+    @lazy_component
+    def dynamic_reconfigs(self):
+        return list(self.package_structure['cfg'].keys())
+
+    @lazy_component
+    def rviz_configs(self):
+        return [cached_parse(path, RVizConfig, rel_fn, path)
+                for rel_fn, path in self.package_structure[None].items() if path.endswith('.rviz')]
+
+    @lazy_component
+    def misc_files(self):
+        return list(self.package_structure[None].keys())
 
     def is_metapackage(self):
         return self.manifest.is_metapackage() or (self.cmake and self.cmake.is_metapackage())
@@ -101,19 +179,24 @@ class Package:
         return packages
 
     def write(self):
-        self.manifest.write()
-        if self.cmake:
-            self.cmake.write()
-        for plugin_config in self.plugin_configs:
-            plugin_config.write()
-        if self.setup_py:
-            self.setup_py.write()
-        for gen in self.get_all_generators():
-            gen.write()
-        for src in self.source_code.sources.values():
-            src.write()
-        for config in self.rviz_configs:
-            config.write()
+        """Write the components that have been loaded (components that were never loaded can't have changed).
+
+        Files whose contents would not change are left alone. Returns the paths of the files that were written.
+        """
+        components = [(self.manifest, self.manifest.fn)]
+        if self.is_loaded('cmake') and self.cmake:
+            components.append((self.cmake, self.cmake.file_path))
+        if self.is_loaded('plugin_configs'):
+            components += [(plugin_config, plugin_config.file_path) for plugin_config in self.plugin_configs]
+        if self.is_loaded('setup_py') and self.setup_py:
+            components.append((self.setup_py, self.setup_py.file_path))
+        if self.is_loaded('generators'):
+            components += [(gen, gen.file_path) for gen in self.get_all_generators()]
+        if self.is_loaded('source_code'):
+            components += [(src, src.file_path) for src in self.source_code.sources.values()]
+        if self.is_loaded('rviz_configs'):
+            components += [(config, config.path) for config in self.rviz_configs]
+        return [path for component, path in components if component.write()]
 
     def __repr__(self):
         s = '== {} ({})========\n'.format(self.name, self.build_type)
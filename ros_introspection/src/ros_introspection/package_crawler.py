@@ -0,0 +1,74 @@
+import os
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    from scandir import scandir
+
+MANIFEST = 'package.xml'
+IGNORE_MARKERS = ['CATKIN_IGNORE', 'COLCON_IGNORE', 'AMENT_IGNORE']
+VCS_FOLDERS = ['.git', '.svn', '.hg', '.bzr']
+WORKSPACE_FOLDERS = ['build', 'devel', 'install', 'log',
+                     'build_isolated', 'devel_isolated', 'install_isolated']
+
+
+def list_folder(folder):
+    """Return the files and the (non-symlinked) subfolders of the folder, in directory order."""
+    files = []
+    folders = []
+    try:
+        entries = list(scandir(folder))
+    except OSError:
+        return files, folders
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if not is_dir:
+            files.append(entry.name)
+        elif not entry.is_symlink():
+            folders.append(entry.name)
+    return files, folders
+
+
+def list_package_files(pkg_root, files=None, folders=None, prefix=''):
+    """Return the paths (relative to pkg_root) of all the files in the package.
+
+    The order matches os.walk, i.e. the files in a folder, followed by the contents of each subfolder.
+    Version control folders are skipped.
+    """
+    if files is None:
+        files, folders = list_folder(pkg_root)
+    listing = [prefix + fn for fn in files]
+    for folder in folders:
+        if folder in VCS_FOLDERS:
+            continue
+        sub_files, sub_folders = list_folder(os.path.join(pkg_root, folder))
+        listing += list_package_files(os.path.join(pkg_root, folder), sub_files, sub_folders, prefix + folder + '/')
+    return listing
+
+
+def crawl(root_fn='.'):
+    """Walk the tree once and return a list of (package_root, files) tuples, sorted by package_root.
+
+    The files are the package's file listing from list_package_files. The walk does not descend into
+    packages looking for other packages, skips version control and build/devel/install/log folders,
+    and ignores folders (including package folders) that contain a CATKIN_IGNORE, COLCON_IGNORE or AMENT_IGNORE file.
+    """
+    packages = []
+    pending = [root_fn]
+    while pending:
+        folder = pending.pop()
+        files, folders = list_folder(folder)
+        # Like catkin and colcon, an ignore marker also skips a package in the same folder
+        if any(marker in files for marker in IGNORE_MARKERS):
+            continue
+        if MANIFEST in files:
+            packages.append((folder, list_package_files(folder, files, folders)))
+            continue
+        for sub_folder in folders:
+            if sub_folder in VCS_FOLDERS or sub_folder in WORKSPACE_FOLDERS:
+                continue
+            pending.append(os.path.join(folder, sub_folder))
+    return sorted(packages, key=lambda package: package[0])
@@ -0,0 +1,44 @@
+import os
+
+from .package_crawler import crawl
+
+# The index that get_package_roots answers from, if one was set for this run (see use_package_index)
+PACKAGE_INDEX = None
+
+
+class PackageIndex:
+    """The roots of the packages found by crawling a folder once, for finding the packages in any of its subfolders.
+
+    Crawling a subfolder finds the same packages as the crawl of the whole folder does in that subfolder,
+    so those queries are answered from memory instead of walking the filesystem again.
+    """
+
+    def __init__(self, root_fn='.', listings=None):
+        self.root = os.path.abspath(root_fn)
+        if listings is None:
+            listings = crawl(root_fn)
+        self.package_roots = sorted(os.path.abspath(package_root) for package_root, filenames in listings)
+
+    def contains(self, folder):
+        folder = os.path.abspath(folder)
+        return folder == self.root or folder.startswith(os.path.join(self.root, ''))
+
+    def get_package_roots(self, folder):
+        """Return the (absolute) roots of the packages in the folder, which must be in the indexed folder."""
+        folder = os.path.abspath(folder)
+        prefix = os.path.join(folder, '')
+        return [package_root for package_root in self.package_roots
+                if package_root == folder or package_root.startswith(prefix)]
+
+
+def use_package_index(index):
+    """Answer get_package_roots queries from the index (or, if None, by crawling every time) from now on."""
+    global PACKAGE_INDEX
+    PACKAGE_INDEX = index
+
+
+def get_package_roots(folder):
+    """Return the roots of the packages in the folder, using the index from use_package_index if it covers it."""
+    if PACKAGE_INDEX is not None and PACKAGE_INDEX.contains(folder):
+        return PACKAGE_INDEX.get_package_roots(folder)
+    return [package_root for package_root, filenames in crawl(folder)]
@@ -1,6 +1,7 @@
 import collections
 import os
 
+from .package_crawler import list_package_files
 from .source_code_file import is_python_hashbang_line
 
 KEY = ['package.xml', 'CMakeLists.txt', 'setup.py']
@@ -22,31 +23,35 @@ def get_filetype_by_contents(filename, ext):
             return 'plugin_config'
 
 
-def get_package_structure(pkg_root):
+def get_package_structure(pkg_root, filenames=None):
+    """Sort the files of the package into categories.
+
+    filenames is an optional listing of the package's files (relative to pkg_root), e.g. from the crawler.
+    If not specified, the package folder is walked to find them.
+    """
     structure = collections.defaultdict(dict)
+    if filenames is None:
+        filenames = list_package_files(pkg_root)
+
+    for rel_fn in filenames:
+        fn = os.path.basename(rel_fn)
+        ext = os.path.splitext(fn)[-1]
+        full = '%s/%s' % (pkg_root, rel_fn)
 
-    for root, dirs, files in os.walk(pkg_root):
-        if '.git' in root or '.svn' in root:
+        if fn[-1] == '~' or fn[-4:] == '.pyc':
             continue
-        for fn in files:
-            ext = os.path.splitext(fn)[-1]
-            full = '%s/%s' % (root, fn)
-            rel_fn = full.replace(pkg_root + '/', '')
-
-            if fn[-1] == '~' or fn[-4:] == '.pyc':
-                continue
-            if fn in KEY:
-                structure['key'][rel_fn] = full
-            elif ext == '.launch':
-                structure['launch'][rel_fn] = full
-            elif ext in SRC_EXTS:
-                structure['source'][rel_fn] = full
-            elif ext in GENERATORS:
-                structure['generators'][rel_fn] = full
-            elif ext == '.cfg' and 'cfg/' in full:
-                structure['cfg'][rel_fn] = full
-            elif ext in ['.urdf', '.xacro']:
-                structure['urdf'][rel_fn] = full
-            else:
-                structure[get_filetype_by_contents(full, ext)][rel_fn] = full
+        if fn in KEY:
+            structure['key'][rel_fn] = full
+        elif ext == '.launch':
+            structure['launch'][rel_fn] = full
+        elif ext in SRC_EXTS:
+            structure['source'][rel_fn] = full
+        elif ext in GENERATORS:
+            structure['generators'][rel_fn] = full
+        elif ext == '.cfg' and 'cfg/' in full:
+            structure['cfg'][rel_fn] = full
+        elif ext in ['.urdf', '.xacro']:
+            structure['urdf'][rel_fn] = full
+        else:
+            structure[get_filetype_by_contents(full, ext)][rel_fn] = full
     return structure
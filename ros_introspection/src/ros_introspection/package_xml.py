@@ -3,6 +3,8 @@ import operator
 import re
 from xml.dom.minidom import parse
 
+from .file_writer import write_if_changed
+
 DEPEND_ORDERING = ['buildtool_depend', 'depend', 'build_depend', 'build_export_depend',
                    'run_depend', 'exec_depend', 'test_depend', 'doc_depend']
 
@@ -460,11 +462,11 @@ class PackageXML:
             new_fn = self.fn
 
         if new_fn == self.fn and not self.changed:
-            return
+            return False
 
+        return write_if_changed(new_fn, self.output())
+
+    def output(self):
         s = self.tree.toxml(self.tree.encoding)
         index = get_package_tag_index(s)
-        s = self.header + s[index:] + '\n'
-
-        with open(new_fn, 'wb') as f:
-            f.write(s.encode('UTF-8'))
+        return self.header + s[index:] + '\n'
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+DEFAULT_CACHE_FOLDER = os.path.expanduser('~/.ros/ros_introspection_cache')
+CACHE_ENVIRONMENT_VARIABLE = 'ROS_INTROSPECTION_CACHE'
+
+CACHE = None
+
+
+def get_source_digest():
+    """Hash the source of this package, which defines the classes of the pickled parse results.
+
+    Using this as the cache version means that any change to those classes (e.g. new attributes or __slots__)
+    makes the entries written by other versions unused, without having to remember to bump a number.
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    for fn in sorted(os.listdir(folder)):
+        if fn.endswith('.py'):
+            digest.update(fn.encode('utf-8'))
+            with open(os.path.join(folder, fn), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+CACHE_VERSION = get_source_digest()
+
+
+def get_file_digest(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class ParseCache:
+    """Stores pickled parse results for individual files on disk.
+
+    Each entry is keyed by the parsing function, its arguments and the file's path, and is only reused
+    while the file's modification time and size match. If only the modification time changed (e.g. after
+    a git checkout), the file's content hash is checked before reparsing.
+    """
+
+    def __init__(self, folder=DEFAULT_CACHE_FOLDER):
+        self.folder = folder
+
+    def get_entry_path(self, file_path, parse_fne, args):
+        key = '%s.%s%s %s' % (parse_fne.__module__, parse_fne.__name__, repr(args), os.path.abspath(file_path))
+        return os.path.join(self.folder, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pickle')
+
+    def read_entry(self, entry_path):
+        if not os.path.exists(entry_path):
+            return None
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None
+        if entry.get('version') != CACHE_VERSION:
+            return None
+        return entry
+
+    def load_result(self, entry_path, entry):
+        """Unpickle the entry's result, or remove the entry and return None if it no longer loads.
+
+        e.g. if the classes of the pickled objects were changed or removed since the entry was written.
+        """
+        try:
+            return pickle.loads(entry['result'])
+        except Exception:
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            return None
+
+    def write_entry(self, entry_path, entry):
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        fd, temp_path = tempfile.mkstemp(dir=self.folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(entry)
+            os.rename(temp_path, entry_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def parse(self, file_path, parse_fne, *args):
+        stat = os.stat(file_path)
+        mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+        entry_path = self.get_entry_path(file_path, parse_fne, args)
+        entry = self.read_entry(entry_path)
+
+        if entry and entry['size'] == stat.st_size:
+            if entry['mtime'] == mtime:
+                result = self.load_result(entry_path, entry)
+                if result is not None:
+                    return result
+            digest = get_file_digest(file_path)
+            if entry['digest'] == digest:
+                result = self.load_result(entry_path, entry)
+                if result is not None:
+                    entry['mtime'] = mtime
+                    self.write_entry(entry_path, pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+                    return result
+        else:
+            digest = get_file_digest(file_path)
+
+        result = parse_fne(*args)
+        try:
+            entry = {'version': CACHE_VERSION, 'mtime': mtime, 'size': stat.st_size, 'digest': digest,
+                     'result': pickle.dumps(result, pickle.HIGHEST_PROTOCOL)}
+            self.write_entry(entry_path, pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            # Results that cannot be pickled (or an unwritable cache folder) just mean the result is not cached
+            pass
+        return result
+
+
+def enable_cache(folder=None):
+    """Turn on the parse cache, stored in the given folder (or ~/.ros/ros_introspection_cache)."""
+    global CACHE
+    CACHE = ParseCache(folder or DEFAULT_CACHE_FOLDER)
+
+
+def disable_cache():
+    global CACHE
+    CACHE = None
+
+
+def cached_parse(file_path, parse_fne, *args):
+    """Return parse_fne(*args), where file_path is the file being parsed.
+
+    If the cache is enabled and the file has not changed since it was last parsed, the stored result is used instead.
+    """
+    if CACHE is None or not os.path.isfile(file_path):
+        return parse_fne(*args)
+    return CACHE.parse(file_path, parse_fne, *args)
+
+
+# The cache can also be turned on by setting the environment variable to 1 (for the default folder) or a folder path
+if os.environ.get(CACHE_ENVIRONMENT_VARIABLE):
+    cache_setting = os.environ[CACHE_ENVIRONMENT_VARIABLE]
+    enable_cache(None if cache_setting.lower() in ['1', 'true', 'yes', 'on'] else os.path.expanduser(cache_setting))
@@ -2,6 +2,8 @@ import os.path
 from collections import OrderedDict
 from xml.dom.minidom import parse
 
+from .file_writer import write_if_changed
+
 NS_PATTERN = '%s::%s'
 
 
@@ -61,9 +63,8 @@ class PluginXML:
 
     def write(self):
         if not self.changed:
-            return
-        with open(self.file_path, 'w') as f:
-            f.write(str(self))
+            return False
+        return write_if_changed(self.file_path, str(self))
 
     def __repr__(self):
         s = ''
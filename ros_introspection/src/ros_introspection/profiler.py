@@ -0,0 +1,214 @@
+import collections
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+
+# The Profiler that measure records into, if profiling was started (see start_profiling)
+PROFILER = None
+
+# The Linux per-process I/O counters, whose rchar line is the number of bytes read so far
+IO_COUNTERS_PATH = '/proc/self/io'
+
+STAT_FIELDS = ['calls', 'seconds', 'self_seconds', 'bytes_read', 'self_bytes_read']
+
+
+class Profiler:
+    """Records the wall time, number of calls and bytes read for each (kind, name, package root).
+
+    The kinds are 'fix' for the roscompile functions and 'component' for building a Package component.
+    seconds and bytes_read include any measured calls nested inside (e.g. a component built by a fix), and
+    self_seconds and self_bytes_read do not, so the self values add up to the total for each package.
+    Bytes read are counted using the Linux I/O counters, and are always zero elsewhere.
+
+    If profile_dir is set, each outermost measured call is also run with cProfile, and the stats are dumped
+    into profile_dir/<package folder>/<name>.prof (combined with the stats from any earlier calls).
+    """
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir
+        self.stats = {}
+        self.stack = []
+        self.io_overhead = 0
+
+    def get_bytes_read(self):
+        try:
+            with open(IO_COUNTERS_PATH, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return 0
+        # Don't count reading the counters themselves
+        bytes_read = 0
+        for line in data.splitlines():
+            if line.startswith(b'rchar:'):
+                bytes_read = int(line.split()[1]) - self.io_overhead
+        self.io_overhead += len(data)
+        return bytes_read
+
+    @contextlib.contextmanager
+    def measure(self, kind, name, package_root):
+        profile = cProfile.Profile() if self.profile_dir and not self.stack else None
+        self.stack.append([0.0, 0])
+        start_bytes = self.get_bytes_read()
+        start = time.time()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            seconds = time.time() - start
+            bytes_read = self.get_bytes_read() - start_bytes
+            nested_seconds, nested_bytes = self.stack.pop()
+            if self.stack:
+                self.stack[-1][0] += seconds
+                self.stack[-1][1] += bytes_read
+            self.add((kind, name, package_root), [1, seconds, seconds - nested_seconds, bytes_read,
+                                                  bytes_read - nested_bytes])
+            if profile:
+                self.dump_profile(profile, name, package_root)
+
+    def add(self, key, values):
+        if key not in self.stats:
+            self.stats[key] = [0] * len(STAT_FIELDS)
+        self.stats[key] = [a + b for a, b in zip(self.stats[key], values)]
+
+    def merge(self, stats):
+        """Add the stats recorded by another Profiler (i.e. in a worker process)."""
+        for key, values in stats.items():
+            self.add(key, values)
+
+    def dump_profile(self, profile, name, package_root):
+        folder = os.path.join(self.profile_dir, os.path.basename(os.path.abspath(package_root)))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        path = os.path.join(folder, name + '.prof')
+        stats = pstats.Stats(profile)
+        if os.path.exists(path):
+            stats.add(path)
+        stats.dump_stats(path)
+
+    def get_rows(self, group_by):
+        """Return a dictionary of the stats for each kind/name/package, summed over the other fields of the keys.
+
+        group_by is a function from a (kind, name, package_root) key to the key of the row. The rows are sorted
+        by decreasing time.
+        """
+        rows = collections.OrderedDict()
+        totals = {}
+        for key, values in self.stats.items():
+            row_key = group_by(key)
+            totals[row_key] = [a + b for a, b in zip(totals.get(row_key, [0] * len(STAT_FIELDS)), values)]
+        for row_key in sorted(totals, key=lambda row_key: (-totals[row_key][1], row_key)):
+            rows[row_key] = dict(zip(STAT_FIELDS, totals[row_key]))
+        return rows
+
+    def get_function_rows(self):
+        return self.get_rows(lambda key: key[:2])
+
+    def get_package_rows(self):
+        # Only the self values add up to the package's totals
+        rows = self.get_rows(lambda key: key[2])
+        for row in rows.values():
+            row['seconds'] = row['self_seconds']
+            row['bytes_read'] = row['self_bytes_read']
+        return rows
+
+    def print_summary(self, stream=None):
+        stream = stream or sys.stderr
+        row_format = '%10s %10s %8s %12s  %s\n'
+        stream.write(row_format % ('seconds', 'self', 'calls', 'bytes read', 'function'))
+        for (kind, name), row in self.get_function_rows().items():
+            stream.write(row_format % ('%.3f' % row['seconds'], '%.3f' % row['self_seconds'], row['calls'],
+                                       row['bytes_read'], '%s (%s)' % (name, kind)))
+        stream.write('\n')
+        stream.write(row_format % ('seconds', '', '', 'bytes read', 'package'))
+        for package_root, row in self.get_package_rows().items():
+            stream.write(row_format % ('%.3f' % row['seconds'], '', '', row['bytes_read'], package_root))
+
+    def write_json(self, path):
+        functions = [dict(row, kind=kind, name=name) for (kind, name), row in self.get_function_rows().items()]
+        packages = [dict(row, package=package_root) for package_root, row in self.get_package_rows().items()]
+        calls = [dict(zip(STAT_FIELDS, values), kind=kind, name=name, package=package_root)
+                 for (kind, name, package_root), values in sorted(self.stats.items())]
+        with open(path, 'w') as f:
+            json.dump({'functions': functions, 'packages': packages, 'calls': calls}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+def start_profiling(profile_dir=None):
+    global PROFILER
+    PROFILER = Profiler(profile_dir)
+    return PROFILER
+
+
+def stop_profiling():
+    global PROFILER
+    profiler = PROFILER
+    PROFILER = None
+    return profiler
+
+
+@contextlib.contextmanager
+def measure(kind, name, package_root):
+    """Record the time and bytes read within this context, if profiling was started. Otherwise, do nothing."""
+    if PROFILER is None:
+        yield
+        return
+    with PROFILER.measure(kind, name, os.path.normpath(package_root)):
+        yield
+
+
+def call_profiled(task):
+    """Call fne(fne_task) for a (fne, fne_task, profile_dir) task in a worker process, with a new Profiler.
+
+    Returns (the result, the recorded stats).
+    """
+    fne, fne_task, profile_dir = task
+    profiler = start_profiling(profile_dir)
+    try:
+        return fne(fne_task), profiler.stats
+    finally:
+        stop_profiling()
+
+
+def imap_profiled(pool, fne, tasks):
+    """Like pool.imap(fne, tasks, chunksize=1), but if profiling, the stats from the workers are merged in."""
+    if PROFILER is None:
+        for result in pool.imap(fne, tasks, chunksize=1):
+            yield result
+        return
+    profiled_tasks = [(fne, task, PROFILER.profile_dir) for task in tasks]
+    for result, stats in pool.imap(call_profiled, profiled_tasks, chunksize=1):
+        PROFILER.merge(stats)
+        yield result
+
+
+def add_profile_arguments(parser):
+    # None of these take an optional value, so they can't swallow a positional argument that follows them
+    parser.add_argument('--profile', action='store_true',
+                        help='Print how long each fix and component took (and the bytes it read) when done')
+    parser.add_argument('--profile-json', metavar='FILE',
+                        help='Like --profile, and also write the numbers as JSON to FILE')
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help='Like --profile, and also dump the cProfile stats for each fix and component to DIR')
+
+
+@contextlib.contextmanager
+def profile_from_args(args):
+    """Profile (see add_profile_arguments) the code run within this context, if requested in the parsed args."""
+    if not args.profile and args.profile_json is None and args.profile_dir is None:
+        yield
+        return
+    profiler = start_profiling(args.profile_dir)
+    try:
+        yield
+    finally:
+        stop_profiling()
+        profiler.print_summary()
+        if args.profile_json:
+            profiler.write_json(args.profile_json)
@@ -1,73 +1,481 @@
+import collections
 import datetime
+import json
+import multiprocessing
 import os
+import re
+import sys
+import tempfile
+import threading
+import time
 
 import requests
 
-from rosmsg import list_types
-
 import rospkg
 
 import yaml
 
 DOT_ROS_FOLDER = os.path.expanduser('~/.ros')
 PY_DEP_FILENAME = os.path.join(DOT_ROS_FOLDER, 'py_deps.yaml')
+PY_DEP_INDEX_FILENAME = os.path.join(DOT_ROS_FOLDER, 'ros_introspection_py_deps.json')
+PY_DEP_INDEX_VERSION = 1
+PY_DEP_URL = 'https://raw.githubusercontent.com/ros/rosdistro/master/rosdep/python.yaml'
+PY_DEP_ENVIRONMENT_VARIABLE = 'ROS_INTROSPECTION_PYTHON_DEPS'
+PY_DEP_MAX_AGE = datetime.timedelta(days=3)
+# After a download is attempted (whether or not it worked), it is not tried again automatically for this long
+PY_DEP_RETRY_DELAY = datetime.timedelta(hours=12)
+PY_DEP_DOWNLOAD_TIMEOUT = 10
+RESOURCE_INDEX_FILENAME = os.path.join(DOT_ROS_FOLDER, 'ros_introspection_resources.json')
+RESOURCE_INDEX_VERSION = 1
 
-PYTHON_DEPS = {}
 
+def write_json(path, data):
+    """Write the data to the path atomically. Errors are ignored, since the files written are only caches."""
+    folder = os.path.dirname(path)
+    try:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        fd, temp_path = tempfile.mkstemp(dir=folder)
+    except (IOError, OSError):
+        return
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        os.remove(temp_path)
 
-def maybe_download_python_deps():
-    global PYTHON_DEPS
-    if os.path.exists(PY_DEP_FILENAME):
-        PYTHON_DEPS = yaml.safe_load(open(PY_DEP_FILENAME))
-        if 'last_download' in PYTHON_DEPS:
-            now = datetime.datetime.now()
-            if now - PYTHON_DEPS['last_download'] < datetime.timedelta(days=3):
-                return
 
+def read_json(path, version):
+    """Read a file written with write_json, returning None if it is missing, unreadable or the wrong version."""
+    if not os.path.exists(path):
+        return None
     try:
-        ff = requests.get('https://raw.githubusercontent.com/ros/rosdistro/master/rosdep/python.yaml').text
-    except requests.exceptions.ConnectionError:
-        print('Cannot retrieve latest python dependencies')
-        return
+        with open(path) as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != version:
+        return None
+    return data
 
-    PYTHON_DEPS = yaml.safe_load(ff)
-    PYTHON_DEPS['last_download'] = datetime.datetime.now()
 
-    if not os.path.exists(DOT_ROS_FOLDER):
-        os.mkdir(DOT_ROS_FOLDER)
-    yaml.dump(PYTHON_DEPS, open(PY_DEP_FILENAME, 'w'))
+def get_python_dependency_variants(key):
+    return [key, 'python-' + key, 'python3-' + key, key.replace('python-', 'python3-'), key.replace('python-', ''),
+            key.replace('python-', '').replace('-', '_')]
 
 
-def get_python_dependency(key):
-    for var in [key, 'python-' + key, 'python3-' + key, key.replace('python-', 'python3-'), key.replace('python-', ''),
-                key.replace('python-', '').replace('-', '_')]:
-        if var in PYTHON_DEPS:
+def find_python_dependency(key, rosdep_keys):
+    for var in get_python_dependency_variants(key):
+        if var in rosdep_keys:
             return var
 
 
-maybe_download_python_deps()
+def build_python_dependency_index(rosdep_keys):
+    """Map the names likely to be looked up (i.e. import names) to the rosdep key find_python_dependency would pick."""
+    candidates = set()
+    for rosdep_key in rosdep_keys:
+        candidates.add(rosdep_key)
+        candidates.add(rosdep_key.replace('_', '-'))
+        for prefix in ['python-', 'python3-']:
+            if rosdep_key.startswith(prefix):
+                base = rosdep_key[len(prefix):]
+                candidates.update([base, base.replace('_', '-'), 'python-' + base])
+    index = {}
+    for candidate in candidates:
+        match = find_python_dependency(candidate, rosdep_keys)
+        if match:
+            index[candidate] = match
+    return index
+
+
+class PythonDependencies:
+    """The python rosdep keys, with an index from the names that get looked up to the matching keys."""
+
+    def __init__(self, rosdep_keys, index=None, source=None, source_mtime=None, updated=None, attempted=None):
+        self.rosdep_keys = set(rosdep_keys)
+        self.index = index if index is not None else build_python_dependency_index(self.rosdep_keys)
+        self.source = source
+        self.source_mtime = source_mtime
+        self.updated = updated if updated is not None else time.time()
+        self.attempted = attempted if attempted is not None else self.updated
+
+    def get(self, key):
+        if key not in self.index:
+            # Names that were not precomputed are resolved once and then remembered for this run
+            self.index[key] = find_python_dependency(key, self.rosdep_keys)
+        return self.index[key]
+
+    def is_stale(self):
+        """Return whether this is a downloaded index that is due to be downloaded again.
+
+        Indexes built from a local python.yaml are never stale, since they are rebuilt when the file changes.
+        """
+        if self.source != PY_DEP_URL:
+            return False
+        now = time.time()
+        return (now - self.updated > PY_DEP_MAX_AGE.total_seconds() and
+                now - self.attempted > PY_DEP_RETRY_DELAY.total_seconds())
+
+    def save(self, path=PY_DEP_INDEX_FILENAME):
+        write_json(path, {'version': PY_DEP_INDEX_VERSION, 'source': self.source, 'source_mtime': self.source_mtime,
+                          'updated': self.updated, 'attempted': self.attempted,
+                          'rosdep_keys': sorted(self.rosdep_keys),
+                          'index': {k: v for k, v in self.index.items() if v}})
+
+    @staticmethod
+    def load(path=PY_DEP_INDEX_FILENAME):
+        data = read_json(path, PY_DEP_INDEX_VERSION)
+        if data is None:
+            return None
+        return PythonDependencies(data['rosdep_keys'], data['index'], data['source'], data['source_mtime'],
+                                  data['updated'], data.get('attempted'))
+
+
+def parse_rosdep_keys(contents):
+    rosdep_yaml = yaml.load(contents, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)) or {}
+    return [key for key in rosdep_yaml if key != 'last_download']
+
+
+def get_python_deps_source_file(path):
+    """Return the python.yaml file for a path that is either the file itself or a rosdistro checkout."""
+    path = os.path.abspath(os.path.expanduser(path))
+    if os.path.isdir(path):
+        path = os.path.join(path, 'rosdep', 'python.yaml')
+    return path
+
+
+def read_python_deps_source(path):
+    path = get_python_deps_source_file(path)
+    with open(path) as f:
+        rosdep_keys = parse_rosdep_keys(f.read())
+    return PythonDependencies(rosdep_keys, source=path, source_mtime=os.path.getmtime(path))
+
+
+def download_python_deps(url=PY_DEP_URL, timeout=30):
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return PythonDependencies(parse_rosdep_keys(response.text), source=url)
+
+
+def read_legacy_python_deps():
+    """Convert the py_deps.yaml file downloaded by older versions, if there is one."""
+    if not os.path.exists(PY_DEP_FILENAME):
+        return None
+    try:
+        with open(PY_DEP_FILENAME) as f:
+            rosdep_yaml = yaml.safe_load(f) or {}
+    except (IOError, OSError, yaml.YAMLError):
+        return None
+    updated = None
+    if isinstance(rosdep_yaml.get('last_download'), datetime.datetime):
+        updated = time.mktime(rosdep_yaml['last_download'].timetuple())
+    rosdep_keys = [key for key in rosdep_yaml if key != 'last_download']
+    return PythonDependencies(rosdep_keys, source=PY_DEP_URL, updated=updated)
+
+
+def update_python_deps(source=None, timeout=30):
+    """Rebuild and save the python dependency index from a python.yaml file/rosdistro checkout or by downloading it."""
+    if source:
+        deps = read_python_deps_source(source)
+    else:
+        deps = download_python_deps(timeout=timeout)
+    deps.save()
+    return deps
+
+
+def try_download_python_deps():
+    """Download and save the python dependencies, waiting for the download (up to its timeout).
+
+    If the download fails, an empty index is saved instead, recording when it was attempted, so that later
+    runs don't wait for the network again (see PY_DEP_RETRY_DELAY).
+    """
+    try:
+        return update_python_deps(timeout=PY_DEP_DOWNLOAD_TIMEOUT)
+    except Exception as e:
+        sys.stderr.write('Could not download the python dependencies (%s)\n' % e)
+        deps = PythonDependencies([], source=PY_DEP_URL, updated=0, attempted=time.time())
+        deps.save()
+        return deps
+
+
+def update_python_deps_in_background(deps):
+    """Download the latest python dependencies for the next run, without waiting for it to finish.
+
+    The attempt is recorded in the saved index first, so that if the download fails (or the run ends before it
+    finishes, since the thread is a daemon) it is not retried on every run.
+    """
+    deps.attempted = time.time()
+    deps.save()
+
+    def update():
+        try:
+            update_python_deps(timeout=PY_DEP_DOWNLOAD_TIMEOUT)
+        except Exception:
+            pass
+    thread = threading.Thread(target=update)
+    thread.daemon = True
+    thread.start()
+
+
+def is_main_process():
+    return multiprocessing.current_process().name == 'MainProcess'
+
+
+def load_python_deps():
+    """Load the python dependencies, only blocking on the network if there is no saved index yet.
+
+    If the ROS_INTROSPECTION_PYTHON_DEPS environment variable is set to a python.yaml file or a rosdistro
+    checkout, it is used (and reindexed whenever it changes). Otherwise, the index saved by the last
+    update is used, and if it was downloaded more than a few days ago, an update is started in the background
+    (by the main process only). If there is no saved index, it is downloaded (with a timeout) before continuing.
+    Failed downloads are recorded in the index, and not retried for a while.
+    """
+    source = os.environ.get(PY_DEP_ENVIRONMENT_VARIABLE)
+    deps = PythonDependencies.load()
+    if source:
+        source_file = get_python_deps_source_file(source)
+        if not os.path.isfile(source_file):
+            sys.stderr.write('%s is set to %s, but %s does not exist\n' % (PY_DEP_ENVIRONMENT_VARIABLE, source,
+                                                                           source_file))
+        elif deps and deps.source == source_file and deps.source_mtime == os.path.getmtime(source_file):
+            return deps
+        else:
+            deps = read_python_deps_source(source_file)
+            deps.save()
+            return deps
+
+    if deps is None:
+        deps = read_legacy_python_deps()
+        if deps is not None:
+            deps.save()
+    if deps is None:
+        deps = try_download_python_deps()
+    if not deps.rosdep_keys:
+        sys.stderr.write('No python dependency information is available. Run update_python_deps.py or set %s\n'
+                         % PY_DEP_ENVIRONMENT_VARIABLE)
+
+    if deps.is_stale() and is_main_process():
+        update_python_deps_in_background(deps)
+    return deps
+
+
+PYTHON_DEPS = None
+
+
+def get_python_deps():
+    global PYTHON_DEPS
+    if PYTHON_DEPS is None:
+        PYTHON_DEPS = load_python_deps()
+    return PYTHON_DEPS
+
+
+def get_python_dependency(key):
+    return get_python_deps().get(key)
+
+
+PACKAGE_FILE = 'package.xml'
+ROSBUILD_MANIFEST_FILE = 'manifest.xml'
+NAME_PATTERN = re.compile(r'<name>(.*?)</name>', re.DOTALL)
+COMMENT_PATTERN = re.compile(r'<!--.*?-->', re.DOTALL)
+METAPACKAGE_PATTERN = re.compile(r'<metapackage\s*/?>')
+GENERATOR_FOLDERS = [('msg', '.msg'), ('srv', '.srv')]
+
+
+def read_package_xml(path):
+    """Return the name of the package and whether it is a metapackage, without fully parsing the xml."""
+    with open(path) as f:
+        contents = COMMENT_PATTERN.sub('', f.read())
+    m = NAME_PATTERN.search(contents)
+    if not m:
+        return None, False
+    return m.group(1).strip(), METAPACKAGE_PATTERN.search(contents) is not None
+
+
+def list_generators(pkg_folder, subfolder, extension):
+    folder = os.path.join(pkg_folder, subfolder)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(fn[:-len(extension)] for fn in os.listdir(folder)
+                  if fn.endswith(extension) and os.path.isfile(os.path.join(folder, fn)))
+
+
+def get_mtime(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return getattr(stat, 'st_mtime_ns', stat.st_mtime)
+
+
+def scan_ros_path(path):
+    """Find the packages (and their messages and services) in one ROS_PACKAGE_PATH entry.
+
+    This matches how rospack finds packages: symlinks are followed, CATKIN_IGNORE'd and hidden folders are
+    skipped, metapackages are not included and the first folder found for each name is used.
+
+    The result can be saved as json. Along with the packages, it includes the modification times of every
+    folder and manifest that was read, so that it can be checked later with is_up_to_date.
+    """
+    path = os.path.abspath(path)
+    entry = {'stamps': {path: get_mtime(path)}, 'packages': [], 'generators': {}}
+
+    def add_package(name, folder):
+        if name in entry['generators']:
+            return
+        entry['packages'].append([name, folder])
+        generators = {}
+        for subfolder, extension in GENERATOR_FOLDERS:
+            generators[subfolder] = list_generators(folder, subfolder, extension)
+            gen_folder = os.path.join(folder, subfolder)
+            entry['stamps'][gen_folder] = get_mtime(gen_folder)
+        entry['generators'][name] = generators
+
+    for folder, folders, files in os.walk(path, topdown=True, followlinks=True):
+        entry['stamps'][folder] = get_mtime(folder)
+        if 'CATKIN_IGNORE' in files:
+            del folders[:]
+            continue
+        if PACKAGE_FILE in files:
+            del folders[:]
+            manifest_path = os.path.join(folder, PACKAGE_FILE)
+            entry['stamps'][manifest_path] = get_mtime(manifest_path)
+            try:
+                name, is_metapackage = read_package_xml(manifest_path)
+            except (IOError, OSError, UnicodeDecodeError):
+                continue
+            if name and not is_metapackage:
+                add_package(name, folder)
+            continue
+        if ROSBUILD_MANIFEST_FILE in files:
+            del folders[:]
+            add_package(os.path.basename(folder), folder)
+            continue
+        if 'rospack_nosubdirs' in files:
+            del folders[:]
+            continue
+        folders[:] = [sub_folder for sub_folder in folders if sub_folder[0] != '.']
+    return entry
+
+
+def is_up_to_date(entry):
+    """Check that none of the folders or manifests read by scan_ros_path have been modified since."""
+    for path, mtime in entry['stamps'].items():
+        if get_mtime(path) != mtime:
+            return False
+    return True
+
+
+class ResourceDatabase:
+    """The packages, messages and services available in the ROS environment.
+
+    The ROS_ROOT and ROS_PACKAGE_PATH folders are only scanned when the database is first queried.
+    When a package is found in more than one folder, the one earliest in the path is used.
+
+    The results of each scan are saved in the index file (if there is one), and only the path entries
+    that have changed since the last run are scanned again.
+    """
+
+    def __init__(self, ros_paths=None, index_path=RESOURCE_INDEX_FILENAME):
+        self.ros_paths = ros_paths
+        self.index_path = index_path
+        self.packages = None
+        self.messages = set()
+        self.services = set()
+        self.generators_by_package = {}
+
+    def read_index(self):
+        if not self.index_path:
+            return {}
+        index = read_json(self.index_path, RESOURCE_INDEX_VERSION)
+        return index['entries'] if index else {}
+
+    def write_index(self, entries):
+        write_json(self.index_path, {'version': RESOURCE_INDEX_VERSION, 'entries': entries})
+
+    def get_entries(self):
+        """Return the scan results for each path entry, from the index where possible.
+
+        The index keeps the entries for other paths too (as long as they exist), so switching between
+        workspaces with different ROS_PACKAGE_PATHs does not rescan them every time.
+        """
+        index = self.read_index()
+        entries = collections.OrderedDict()
+        changed = False
+        for path in self.ros_paths:
+            path = os.path.abspath(path)
+            entry = index.get(path)
+            if entry is None or not is_up_to_date(entry):
+                entry = scan_ros_path(path)
+                changed = True
+            entries[path] = entry
+        if self.index_path and changed:
+            saved = {path: entry for path, entry in index.items() if os.path.isdir(path)}
+            saved.update(entries)
+            self.write_index(saved)
+        return entries
+
+    def load(self):
+        if self.packages is not None:
+            return
+        if self.ros_paths is None:
+            self.ros_paths = rospkg.get_ros_paths()
+
+        self.packages = {}
+        for entry in self.get_entries().values():
+            for pkg, folder in entry['packages']:
+                if pkg in self.packages:
+                    continue
+                self.packages[pkg] = folder
+                generators = entry['generators'][pkg]
+                self.generators_by_package[pkg] = generators
+                self.messages.update((pkg, msg) for msg in generators['msg'])
+                self.services.update((pkg, srv) for srv in generators['srv'])
+
+    def is_package(self, pkg):
+        self.load()
+        return pkg in self.packages
+
+    def is_message(self, pkg, msg):
+        self.load()
+        return (pkg, msg) in self.messages
+
+    def is_service(self, pkg, srv):
+        self.load()
+        return (pkg, srv) in self.services
+
+
+DATABASE = ResourceDatabase()
+
+
+def get_resource_database():
+    return DATABASE
+
+
+def get_package_names():
+    DATABASE.load()
+    return set(DATABASE.packages)
+
 
+def get_messages():
+    """Return the set of all (package, message) tuples."""
+    DATABASE.load()
+    return DATABASE.messages
 
-PACKAGES = set()
-MESSAGES = set()
-SERVICES = set()
 
-rospack = rospkg.RosPack()
-for pkg in rospack.list():
-    PACKAGES.add(pkg)
-    for mode, ros_set in [('.msg', MESSAGES), ('.srv', SERVICES)]:
-        for gen_key in list_types(pkg, mode, rospack):
-            pkg, gen = gen_key.split('/')
-            ros_set.add((pkg, gen))
+def get_services():
+    """Return the set of all (package, service) tuples."""
+    DATABASE.load()
+    return DATABASE.services
 
 
 def is_package(pkg):
-    return pkg in PACKAGES
+    return DATABASE.is_package(pkg)
 
 
 def is_message(pkg, msg):
-    return (pkg, msg) in MESSAGES
+    return DATABASE.is_message(pkg, msg)
 
 
 def is_service(pkg, srv):
-    return (pkg, srv) in SERVICES
+    return DATABASE.is_service(pkg, srv)
@@ -1,6 +1,8 @@
 import os.path
 import re
 
+from .file_writer import write_if_changed
+
 AT_LEAST_THREE_DASHES = re.compile(r'^\-{3,}\r?$')
 FIELD_LINE = re.compile(r'([\w_/]+)(\[\d*\])?\s+([\w_]+)\s*(=.*)?(\s*\#.*)?$', re.DOTALL)
 PRIMITIVES = ['bool', 'int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64',
@@ -92,9 +94,8 @@ class ROSGenerator:
 
     def write(self):
         if not self.changed:
-            return
-        with open(self.file_path, 'w') as f:
-            f.write(self.output())
+            return False
+        return write_if_changed(self.file_path, self.output())
 
     def __repr__(self):
         return self.name
@@ -2,6 +2,13 @@ import sys
 import yaml
 import ruamel.yaml  # For custom yaml dumping
 
+from .file_writer import write_if_changed
+
+try:
+    from StringIO import StringIO
+except ImportError:  # Python 3
+    from io import StringIO
+
 
 my_yaml_writer = ruamel.yaml.YAML()
 my_yaml_writer.indent(mapping=2, sequence=4, offset=2)
@@ -73,6 +80,10 @@ class RVizConfig:
 
     def write(self):
         if not self.changed:
-            return
-        with open(self.path, 'w') as f:
-            my_yaml_writer.dump(self.contents, f, transform=lambda s: s.replace(": ''\n", ': ""\n'))
+            return False
+        return write_if_changed(self.path, self.output())
+
+    def output(self):
+        stream = StringIO()
+        my_yaml_writer.dump(self.contents, stream)
+        return stream.getvalue().replace(": ''\n", ': ""\n')
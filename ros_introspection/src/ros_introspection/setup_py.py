@@ -3,6 +3,8 @@ import collections
 import os
 import sys
 
+from .file_writer import write_if_changed
+
 # Version-Dependent AST operations
 if sys.version_info.major == 3 and sys.version_info.minor >= 8:
     def is_constant(el):
@@ -232,9 +234,8 @@ class SetupPy:
 
     def write(self):
         if not self.changed:
-            return
-        with open(self.file_path, 'w') as f:
-            f.write(str(self))
+            return False
+        return write_if_changed(self.file_path, str(self))
 
     def __repr__(self):
         s = ''
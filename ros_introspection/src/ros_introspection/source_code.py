@@ -1,6 +1,6 @@
 import os.path
 
-from .source_code_file import SourceCodeFile
+from .source_code_file import SourceCodeFile, compile_patterns
 
 
 class SourceCode:
@@ -82,8 +82,10 @@ class SourceCode:
         If there are no groups, then the matching string is replaced with the map value.
         If there are groups, then the literals of the form $0, $1, etc in the map value are replaced with the groups
         """
+        # Compile the patterns once for all of the files
+        compiled_patterns = compile_patterns(patterns)
         for source in self.get_source_by_language(language):
-            source.modify_with_patterns(patterns, verbose)
+            source.modify_with_patterns(compiled_patterns, verbose)
 
     def __repr__(self):
         return '\n'.join(map(str, sorted(self.sources.values())))
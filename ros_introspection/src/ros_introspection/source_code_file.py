@@ -1,6 +1,10 @@
+import collections
+import io
 import os
 import re
 
+from .file_writer import write_if_changed
+from .parse_cache import cached_parse
 from .resource_list import get_python_dependency, is_package
 
 PKG = r'([^\.;]+)(\.?[^;]*)?'
@@ -11,21 +15,101 @@ CPLUS2 = re.compile(r'#include\s*[<\\"]([^/]*)/([^/]*)/([^/]*)[>\\"]')  # Two sl
 ROSCPP = re.compile(r'#include\s*<ros/ros.h>')
 
 EXPRESSIONS = [re.compile(PYTHON1), re.compile(PYTHON2), CPLUS, CPLUS2]
+IMPORT_PATTERNS = tuple(EXPRESSIONS + [ROSCPP])
+
+# Files larger than this many bytes (e.g. generated or vendored code) are not read or searched
+MAX_SOURCE_SIZE_ENVIRONMENT_VARIABLE = 'ROS_INTROSPECTION_MAX_SOURCE_SIZE'
+MAX_SOURCE_SIZE = int(os.environ.get(MAX_SOURCE_SIZE_ENVIRONMENT_VARIABLE, 4 * 1024 * 1024))
+# The number of bytes checked at the start of each file to detect binary files
+BINARY_CHECK_SIZE = 8192
+
+# The $0, $1, etc in a replacement are replaced with the first, second, etc group of the match
+REPLACEMENT_GROUP = re.compile(r'\$(\d+)')
+
+REGEX_SPECIAL = set('.^$*+?{}[]|()\\')
+QUANTIFIERS = set('*+?{')
+# The required literal of each compiled pattern, oldest first, for at most MAX_REQUIRED_LITERALS patterns
+REQUIRED_LITERALS = collections.OrderedDict()
+MAX_REQUIRED_LITERALS = 512
 
 
 def is_python_hashbang_line(s):
     return s[0:2] == '#!' and 'python' in s
 
 
+def get_required_literal(pattern):
+    """Return the literal text that every match of the pattern starts with (or None if there isn't a useful one).
+
+    Lines that don't contain the literal can be skipped without running the regex on them.
+    """
+    if pattern in REQUIRED_LITERALS:
+        return REQUIRED_LITERALS[pattern]
+    if len(REQUIRED_LITERALS) >= MAX_REQUIRED_LITERALS:
+        REQUIRED_LITERALS.popitem(last=False)
+    literal = ''
+    source = pattern.pattern
+    if not isinstance(source, str) or pattern.flags & (re.IGNORECASE | re.VERBOSE) or '|' in source:
+        source = ''
+    i = 1 if source.startswith('^') else 0
+    while i < len(source):
+        c = source[i]
+        if c == '\\' and i + 1 < len(source) and not source[i + 1].isalnum():
+            c = source[i + 1]
+            i += 1
+        elif c in REGEX_SPECIAL:
+            if c in QUANTIFIERS:
+                # The last character is optional/repeated, so it is not part of the required literal
+                literal = literal[:-1]
+            break
+        literal += c
+        i += 1
+    REQUIRED_LITERALS[pattern] = literal if len(literal) >= 3 else None
+    return REQUIRED_LITERALS[pattern]
+
+
+def compile_patterns(patterns):
+    """Compile a map of patterns (see SourceCodeFile.modify_with_patterns) into a list of (regex, replacement)."""
+    return [(re.compile(needle), replacement) for needle, replacement in patterns.items()]
+
+
+def expand_replacement(replacement, groups):
+    if not groups or '$' not in replacement:
+        return replacement
+
+    def get_group(m):
+        i = int(m.group(1))
+        if i < len(groups):
+            return groups[i] or ''
+        return m.group(0)
+    return REPLACEMENT_GROUP.sub(get_group, replacement)
+
+
 class SourceCodeFile:
     def __init__(self, rel_fn, file_path):
         self.rel_fn = rel_fn
         self.file_path = file_path
         self.tags = set()
         self.changed_contents = None
+        self.clear_scan_results()
+
+        # The contents are only read when they are first needed, and then kept in self.contents
+        self.contents = None
+        # The encoding the contents were decoded with, which they are encoded with again when written
+        self.encoding = 'utf-8'
+        self.skipped = False
+        first_line = ''
+        try:
+            if os.path.getsize(file_path) > MAX_SOURCE_SIZE:
+                self.skipped = True
+            else:
+                with open(file_path, 'rb') as f:
+                    head = f.read(BINARY_CHECK_SIZE)
+                self.skipped = b'\0' in head
+                first_line = head.split(b'\n')[0].decode('utf-8', 'replace').strip()
+        except OSError:
+            self.skipped = True
 
-        self.lines = list(map(str.strip, self.get_contents().split('\n')))
-        if '.py' in self.file_path or (len(self.lines) > 0 and is_python_hashbang_line(self.lines[0])):
+        if '.py' in self.file_path or is_python_hashbang_line(first_line):
             self.language = 'python'
         else:
             self.language = 'c++'
@@ -37,31 +121,103 @@ class SourceCodeFile:
     def get_contents(self):
         if self.changed_contents:
             return self.changed_contents
-        return open(self.file_path).read()
+        if self.contents is None:
+            self.contents = ''
+            if not self.skipped:
+                try:
+                    with io.open(self.file_path, encoding=self.encoding) as f:
+                        self.contents = f.read()
+                except UnicodeDecodeError:
+                    # Every byte decodes as latin-1 (and encodes back to the same byte), so writes don't change the
+                    # parts of the file that were not replaced
+                    self.encoding = 'latin-1'
+                    with io.open(self.file_path, encoding=self.encoding) as f:
+                        self.contents = f.read()
+        return self.contents
+
+    def iter_lines(self):
+        """Yield each of the lines (stripped) one at a time, rather than splitting all of the contents at once."""
+        contents = self.get_contents()
+        start = 0
+        end = contents.find('\n')
+        while end != -1:
+            yield contents[start:end].strip()
+            start = end + 1
+            end = contents.find('\n', start)
+        yield contents[start:].strip()
+
+    def iter_lines_containing(self, literals):
+        """Yield (in order) each of the lines (stripped) that contain at least one of the literal strings."""
+        contents = self.get_contents()
+        starts = set()
+        for literal in set(literals):
+            pos = contents.find(literal)
+            while pos != -1:
+                starts.add(contents.rfind('\n', 0, pos) + 1)
+                end = contents.find('\n', pos)
+                if end == -1:
+                    break
+                pos = contents.find(literal, end + 1)
+        for start in sorted(starts):
+            end = contents.find('\n', start)
+            if end == -1:
+                end = len(contents)
+            yield contents[start:end].strip()
+
+    @property
+    def lines(self):
+        return list(self.iter_lines())
+
+    def clear_scan_results(self):
+        # Search results are cached per tuple of patterns, until the contents are replaced
+        self.line_matches = {}
+        self.content_matches = {}
+        self.import_packages = None
 
     def replace_contents(self, contents):
         self.changed_contents = contents
-        try:
-            self.lines = map(unicode.strip, unicode(contents).split('\n'))
-        except NameError:
-            # Python3 Case
-            self.lines = list(map(str.strip, contents.split('\n')))
+        self.clear_scan_results()
 
     def search_for_patterns(self, patterns):
-        matches = []
-        contents = self.get_contents()
-        for pattern in patterns:
-            matches += pattern.findall(contents)
-        return matches
+        patterns = tuple(patterns)
+        if patterns not in self.content_matches:
+            matches = []
+            contents = self.get_contents()
+            for pattern in patterns:
+                matches += pattern.findall(contents)
+            self.content_matches[patterns] = matches
+        return list(self.content_matches[patterns])
+
+    def scan_lines(self, patterns):
+        """Search each line with each of the patterns in a single pass over the lines.
+
+        Returns a tuple of (pattern index, match groups) in line order (and pattern order within a line).
+        """
+        patterns = tuple(patterns)
+        if patterns in self.line_matches:
+            return self.line_matches[patterns]
+
+        searches = [(i, get_required_literal(pattern), pattern.search) for i, pattern in enumerate(patterns)]
+        literals = [literal for i, literal, search in searches]
+        if None in literals:
+            lines = self.iter_lines()
+        else:
+            # Only the lines containing one of the literals can match, so find those without splitting the contents
+            lines = self.iter_lines_containing(literals)
 
-    def search_lines_for_patterns(self, patterns):
         matches = []
-        for line in self.lines:
-            for pattern in patterns:
-                m = pattern.search(line)
+        for line in lines:
+            for i, literal, search in searches:
+                if literal is not None and literal not in line:
+                    continue
+                m = search(line)
                 if m:
-                    matches.append(m.groups())
-        return matches
+                    matches.append((i, m.groups()))
+        self.line_matches[patterns] = tuple(matches)
+        return self.line_matches[patterns]
+
+    def search_lines_for_patterns(self, patterns):
+        return [groups for i, groups in self.scan_lines(patterns)]
 
     def search_lines_for_pattern(self, pattern):
         return self.search_lines_for_patterns([pattern])
@@ -73,36 +229,50 @@ class SourceCodeFile:
         The key in the map (needle) is a regular expression string literal.
         If there are no groups, then the matching string is replaced with the map value.
         If there are groups, then the literals of the form $0, $1, etc in the map value are replaced with the groups
+
+        Each needle is applied in a single pass over the contents, so replacements are not searched again.
+        The patterns can also be given already compiled (see compile_patterns).
         """
+        if isinstance(patterns, dict):
+            patterns = compile_patterns(patterns)
         s = self.get_contents()
         changed = False
-        for needle, replacement in patterns.items():
-            pattern = re.compile(needle)
-            m = pattern.search(s)
-            while m:
-                this_replacement = replacement
-                if len(m.groups()) > 0:
-                    for i, chunk in enumerate(m.groups()):
-                        key = '$%d' % i
-                        this_replacement = this_replacement.replace(key, chunk)
-                before, middle, after = s.partition(m.group(0))
+        for pattern, replacement in patterns:
+            literal = get_required_literal(pattern)
+            if literal is not None and literal not in s:
+                continue
+
+            def replace(m):
+                this_replacement = expand_replacement(replacement, m.groups())
                 if verbose:
-                    print('In %s, replacing %s with %s' % (self.rel_fn, middle, this_replacement))
-                s = before + this_replacement + after
+                    print('In %s, replacing %s with %s' % (self.rel_fn, m.group(0), this_replacement))
+                return this_replacement
 
+            s, count = pattern.subn(replace, s)
+            if count:
                 changed = True
-                m = pattern.search(s)
-            if changed:
-                self.replace_contents(s)
+        if changed:
+            self.replace_contents(s)
 
-    def get_import_packages(self):
+    def scan_import_packages(self):
         pkgs = set()
-        for match in self.search_lines_for_patterns(EXPRESSIONS):
-            pkgs.add(match[0])
-        if len(self.search_lines_for_pattern(ROSCPP)) > 0:
-            pkgs.add('roscpp')
+        roscpp_index = len(IMPORT_PATTERNS) - 1
+        for i, groups in self.scan_lines(IMPORT_PATTERNS):
+            if i == roscpp_index:
+                pkgs.add('roscpp')
+            else:
+                pkgs.add(groups[0])
         return sorted(pkgs)
 
+    def get_import_packages(self):
+        if self.import_packages is None:
+            if self.changed_contents:
+                self.import_packages = self.scan_import_packages()
+            else:
+                # The contents are only read (and scanned) if the file changed since the result was cached
+                self.import_packages = cached_parse(self.file_path, self.scan_import_packages)
+        return list(self.import_packages)
+
     def get_dependencies(self):
         deps = []
         for pkg in self.get_import_packages():
@@ -132,6 +302,6 @@ class SourceCodeFile:
         return '%s (%s)' % (self.rel_fn, ', '.join(attribs))
 
     def write(self):
-        if self.changed_contents:
-            with open(self.file_path, 'w') as f:
-                f.write(self.changed_contents)
+        if not self.changed_contents or self.skipped:
+            return False
+        return write_if_changed(self.file_path, self.changed_contents.encode(self.encoding))
@@ -1,33 +1,88 @@
+import multiprocessing
 import os
 import os.path
 import sys
 import traceback
 
 from .package import Package
+from .package_crawler import crawl
+from .package_index import get_package_roots
+from .profiler import imap_profiled
 
 
-def get_packages(root_fn='.', create_objects=True):
+def load_package(root, filenames=None, load_components=False):
+    """Build the Package at the given root, returning a (root, package, error_message) tuple.
+
+    Package components are normally parsed the first time they are used. If load_components is True,
+    they are all parsed here instead, so a component that cannot be parsed is reported here as an error
+    (and the package skipped) instead of raising an exception in the middle of whatever uses it first.
+    """
+    try:
+        package = Package(root, filenames)
+        if load_components:
+            package.load_components()
+        return root, package, None
+    except Exception:
+        return root, None, traceback.format_exc()
+
+
+def load_package_listing(listing):
+    """Call load_package with a (root, filenames) tuple. Module-level so it can be sent to worker processes.
+
+    All of the components are parsed, so that the parsing is actually done in the worker processes
+    (instead of the first time each component is used, after the package was sent back).
+    """
+    root, filenames = listing
+    return load_package(root, filenames, load_components=True)
+
+
+def load_packages(listings, jobs=1):
+    """Build a Package for each (root, filenames) listing, in the same order, optionally using multiple processes.
+
+    If jobs is None or 0, one process per available core is used. With a single process, the components
+    are parsed the first time they are used, as usual.
+    """
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+
+    if jobs == 1 or len(listings) < 2:
+        results = [load_package(root, filenames) for root, filenames in listings]
+    else:
+        pool = multiprocessing.Pool(min(jobs, len(listings)))
+        try:
+            results = list(imap_profiled(pool, load_package_listing, listings))
+        finally:
+            pool.close()
+            pool.join()
+
     packages = []
-    for root, dirs, files in sorted(os.walk(root_fn)):
-        if '.git' in root:
-            continue
-        if 'package.xml' in files:
-            if create_objects:
-                try:
-                    packages.append(Package(root))
-                except Exception:
-                    sys.stderr.write('ERROR: Trouble parsing package @ %s\n' % root)
-                    sys.stderr.write(traceback.format_exc())
-            else:
-                packages.append(root)
+    for root, package, error in results:
+        if error:
+            sys.stderr.write('ERROR: Trouble parsing package @ %s\n' % root)
+            sys.stderr.write(error)
+        else:
+            packages.append(package)
     return packages
 
 
+def get_packages(root_fn='.', create_objects=True, jobs=1):
+    listings = crawl(root_fn)
+    if create_objects:
+        return load_packages(listings, jobs)
+    else:
+        return [root for root, filenames in listings]
+
+
 def get_sibling_packages(package):
+    """Return the names of the folders of the other packages in the package's parent folder (and its subfolders).
+
+    If the parent folder is part of the package index for this run (see package_index.use_package_index),
+    the packages are found without walking the filesystem again.
+    """
     parent_path = os.path.abspath(os.path.join(package.root, '..'))
 
     sibling_packages = set()
-    for sub_package in get_packages(parent_path, create_objects=False):
+    for sub_package in get_package_roots(parent_path):
         pkg_name = os.path.split(sub_package)[1]
         if pkg_name != package.name:
             sibling_packages.add(pkg_name)
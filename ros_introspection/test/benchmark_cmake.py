@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""Time the stages of reading, modifying and writing CMakeLists.txt files.
+
+By default, synthetic CMakeLists of increasing size are generated. Alternatively, point it at a folder
+(i.e. your workspace) with -d to time all of the CMakeLists.txt files found within.
+"""
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+
+from ros_introspection.cmake import CMake, CommandGroup
+from ros_introspection.cmake_parser import parse_command, parse_commands, tokenize
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+try:
+    timer = time.perf_counter
+except AttributeError:  # Python 2
+    timer = time.time
+
+STAGES = ['parse', 'serialize_unchanged', 'resolve', 'section_check', 'reorder', 'serialize_modified']
+TARGET_COMMANDS = ['add_library', 'add_executable']
+
+
+def generate_cmake(num_targets, num_sources=20, depth=2, seed=0):
+    """Generate a CMakeLists with the given number of targets, each with num_sources source files.
+
+    Every fourth target is nested inside depth levels of alternating if/foreach blocks.
+    """
+    rng = random.Random(seed)
+    lines = ['cmake_minimum_required(VERSION 3.0.2)', 'project(benchmark_pkg)', '',
+             'find_package(catkin REQUIRED COMPONENTS roscpp std_msgs)',
+             'set(SRC_PREFIX src/${PROJECT_NAME})', 'set(COMMON_LIBS ${catkin_LIBRARIES} ${Boost_LIBRARIES})',
+             'catkin_package()', 'include_directories(include ${catkin_INCLUDE_DIRS})', '']
+    for i in range(num_targets):
+        cmd = TARGET_COMMANDS[i % 2]
+        target = 'target_%d' % i
+        sources = ['${SRC_PREFIX}/file_%d_%d.cpp' % (i, j) for j in range(rng.randint(1, 2 * num_sources - 1))]
+        body = ['%s(%s' % (cmd, target)] + ['  ' + source for source in sources] + [')']
+        body.append('target_link_libraries(%s ${COMMON_LIBS})  # link' % target)
+        body.append('add_dependencies(%s ${catkin_EXPORTED_TARGETS})' % target)
+        if i % 4 == 3:
+            for d in range(depth - 1, -1, -1):
+                if d % 2:
+                    body = ['foreach(item_%d ${ITEMS_%d})' % (d, d)] + ['  ' + line for line in body] + ['endforeach()']
+                else:
+                    body = ['if(OPTION_%d)' % d] + ['  ' + line for line in body] + ['endif()']
+        lines += body + ['']
+    lines += ['install(TARGETS %s' % ' '.join('target_%d' % i for i in range(num_targets)),
+              '  DESTINATION ${CATKIN_PACKAGE_LIB_DESTINATION}', ')', '',
+              'if(CATKIN_ENABLE_TESTING)', '  find_package(rostest REQUIRED)',
+              '  add_rostest(test/benchmark.test)', 'endif()', '']
+    return '\n'.join(lines)
+
+
+def get_all_cmakes(cmake):
+    """Return the CMake object and the CMake objects nested inside of its command groups."""
+    cmakes = [cmake]
+    for content in cmake.contents:
+        if content.__class__ == CommandGroup:
+            cmakes += get_all_cmakes(content.sub)
+    return cmakes
+
+
+def resolve_all(cmake):
+    count = 0
+    for sub in get_all_cmakes(cmake):
+        for commands in sub.content_map.values():
+            for cmd in commands:
+                if cmd.__class__ != CommandGroup:
+                    count += len(sub.get_resolved_tokens(cmd, include_name=True))
+        sub.get_target_build_rules()
+    return count
+
+
+def check_sections(cmake):
+    # Only check commands that already exist, since section_check cannot create commands with unnamed sections
+    for target in cmake.get_libraries() + cmake.get_executables():
+        for cmd_name, items in [('add_dependencies', ['${catkin_EXPORTED_TARGETS}', 'extra_dependency']),
+                                ('target_link_libraries', ['${catkin_LIBRARIES}', target + '_extra'])]:
+            if cmake.content_map[cmd_name]:
+                cmake.section_check(items, cmd_name)
+    if cmake.content_map['include_directories']:
+        cmake.section_check(['include', 'extra_include'], 'include_directories')
+
+
+def run_stages(contents):
+    """Run each stage once, returning the time taken by each stage and the serialized output.
+
+    The CMake keeps its source (like parse_file does), so serialize_unchanged times writing out a file that was
+    not modified, and serialize_modified times writing it after the other stages (and at least one new command).
+    """
+    times = {}
+    start = timer()
+    cmake = CMake(initial_contents=parse_commands(contents), source=contents)
+    times['parse'] = timer() - start
+
+    start = timer()
+    str(cmake)
+    times['serialize_unchanged'] = timer() - start
+
+    start = timer()
+    resolve_all(cmake)
+    times['resolve'] = timer() - start
+
+    start = timer()
+    check_sections(cmake)
+    times['section_check'] = timer() - start
+
+    start = timer()
+    cmake.enforce_ordering()
+    times['reorder'] = timer() - start
+
+    if not cmake.is_changed():
+        cmake.add_command(parse_command('add_definitions(-DBENCHMARK)'))
+    start = timer()
+    output = str(cmake)
+    times['serialize_modified'] = timer() - start
+    return times, output
+
+
+def measure_memory(contents):
+    """Return the peak memory used while parsing, and the memory still used by the parsed CMake object, in bytes."""
+    if tracemalloc is None:
+        return None, None
+    gc.collect()
+    tracemalloc.start()
+    cmake = CMake(initial_contents=parse_commands(contents), source=contents)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cmake
+    return peak, current
+
+
+def benchmark(name, contents, repeat):
+    num_tokens = len(tokenize(contents)[0])
+    best = {}
+    round_trip = None
+
+    # Hide the messages printed while modifying the CMake
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        for _ in range(repeat):
+            times, output = run_stages(contents)
+            for stage, t in times.items():
+                best[stage] = min(best.get(stage, t), t)
+            if round_trip is None:
+                # Without the source, so that the output is rebuilt from the parsed commands
+                round_trip = str(CMake(initial_contents=parse_commands(contents))) == contents
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    peak, retained = measure_memory(contents)
+    result = {'name': name, 'bytes': len(contents), 'tokens': num_tokens, 'times': best,
+              'peak_memory': peak, 'retained_memory': retained, 'round_trip': round_trip}
+    result['tokens_per_second'] = num_tokens / best['parse'] if best['parse'] else None
+    return result
+
+
+def find_cmake_files(folder):
+    paths = []
+    for root, folders, files in os.walk(folder):
+        folders[:] = sorted(f for f in folders if f[0] != '.')
+        if 'CMakeLists.txt' in files:
+            paths.append(os.path.join(root, 'CMakeLists.txt'))
+    return paths
+
+
+def format_kb(n_bytes):
+    return '-' if n_bytes is None else '%d' % (n_bytes / 1024)
+
+
+def print_table(results):
+    headers = ['name', 'tokens'] + ['%s ms' % stage for stage in STAGES] + ['tokens/s', 'peak KB', 'AST KB', 'ok']
+    rows = []
+    for result in results:
+        row = [result['name'], str(result['tokens'])]
+        row += ['%.2f' % (result['times'][stage] * 1000) for stage in STAGES]
+        row.append('%d' % result['tokens_per_second'] if result['tokens_per_second'] else '-')
+        row += [format_kb(result['peak_memory']), format_kb(result['retained_memory'])]
+        row.append('yes' if result['round_trip'] else 'NO')
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    print('  '.join(header.rjust(width) for header, width in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-d', '--directory', help='Benchmark the CMakeLists.txt files in this folder instead')
+    parser.add_argument('-t', '--targets', default='10,100,1000',
+                        help='Comma separated numbers of targets for the synthetic CMakeLists (default: %(default)s)')
+    parser.add_argument('-s', '--sources', type=int, default=20, help='Average number of sources per target')
+    parser.add_argument('--depth', type=int, default=3, help='Nesting depth of the if/foreach blocks')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Use the best time of this many runs')
+    parser.add_argument('--json', metavar='FILE', help='Also save the results to this json file')
+    args = parser.parse_args()
+
+    results = []
+    if args.directory:
+        for path in find_cmake_files(args.directory):
+            with open(path) as f:
+                contents = f.read()
+            try:
+                results.append(benchmark(os.path.relpath(path, args.directory), contents, args.repeat))
+            except Exception as e:
+                sys.stderr.write('Could not benchmark %s: %s\n' % (path, e))
+    else:
+        for num_targets in map(int, args.targets.split(',')):
+            contents = generate_cmake(num_targets, args.sources, args.depth)
+            results.append(benchmark('%d targets' % num_targets, contents, args.repeat))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
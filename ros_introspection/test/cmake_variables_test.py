@@ -0,0 +1,62 @@
+from ros_introspection.cmake import CMake
+from ros_introspection.cmake_parser import parse_command, parse_commands
+
+VARIABLES = """project(my_pkg)
+set(SRC_DIR src)
+set(CORE_SRCS ${SRC_DIR}/a.cpp ${SRC_DIR}/b.cpp)
+set(ALL_SRCS ${CORE_SRCS} ${SRC_DIR}/c.cpp)
+set(MODE core)
+set(core_NAME ${PROJECT_NAME}_core)
+set(SELF ${SELF}/x)
+set(PING pre_${PONG})
+set(PONG ${PING}_post)
+"""
+
+
+def parse_cmake(s):
+    return CMake(initial_contents=parse_commands(s), source=s)
+
+
+def fresh_value(s, name):
+    """Resolve the variable in a newly parsed CMake, so that nothing is cached yet."""
+    return parse_cmake(s).resolve_variables('${%s}' % name)
+
+
+def test_nested_variables():
+    cmake = parse_cmake(VARIABLES)
+    assert cmake.resolve_variables('${ALL_SRCS}') == 'src/a.cpp src/b.cpp src/c.cpp'
+    assert cmake.resolve_variables(['${ALL_SRCS}', 'd.cpp']) == ['src/a.cpp', 'src/b.cpp', 'src/c.cpp', 'd.cpp']
+    # References inside of references
+    assert cmake.resolve_variables('${${MODE}_NAME}') == 'my_pkg_core'
+    assert cmake.resolve_variables('${UNKNOWN}/${SRC_DIR}') == '${UNKNOWN}/src'
+
+
+def test_cyclic_variables():
+    assert fresh_value(VARIABLES, 'SELF') == '${SELF}/x'
+    assert fresh_value(VARIABLES, 'PING') == 'pre_${PING}_post'
+    assert fresh_value(VARIABLES, 'PONG') == 'pre_${PONG}_post'
+
+    # The results don't depend on which of the variables in the cycle was resolved first
+    for first, second in [('PING', 'PONG'), ('PONG', 'PING')]:
+        cmake = parse_cmake(VARIABLES)
+        assert cmake.resolve_variables('${%s}' % first) == fresh_value(VARIABLES, first)
+        assert cmake.resolve_variables('${%s}' % second) == fresh_value(VARIABLES, second)
+        assert cmake.resolve_variables('${%s}' % first) == fresh_value(VARIABLES, first)
+
+
+def test_variables_follow_changes():
+    cmake = parse_cmake(VARIABLES)
+    assert cmake.resolve_variables('${CORE_SRCS}') == 'src/a.cpp src/b.cpp'
+
+    # Modifying a set command
+    set_cmd = cmake.content_map['set'][0]
+    set_cmd.get_real_sections()[0].values[0] = 'source'
+    set_cmd.changed = True
+    assert cmake.resolve_variables('${CORE_SRCS}') == 'source/a.cpp source/b.cpp'
+
+    # Adding and removing set commands
+    new_cmd = parse_command('set(EXTRA_SRCS e.cpp)')
+    cmake.add_command(new_cmd)
+    assert cmake.resolve_variables('${EXTRA_SRCS}') == 'e.cpp'
+    cmake.remove_command(new_cmd)
+    assert cmake.resolve_variables('${EXTRA_SRCS}') == '${EXTRA_SRCS}'
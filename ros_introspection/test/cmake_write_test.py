@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+
+from ros_introspection.cmake_parser import parse_command, parse_file
+
+CMAKE = """cmake_minimum_required(VERSION 3.0.2)
+project(my_pkg)
+
+find_package(catkin REQUIRED COMPONENTS roscpp  std_msgs)   # odd spacing is kept
+if(CATKIN_ENABLE_TESTING)
+  find_package(rostest REQUIRED)
+endif()
+"""
+
+OLD_TIME = 1000000000
+
+
+def write_cmake(folder, contents=CMAKE):
+    path = os.path.join(folder, 'CMakeLists.txt')
+    with open(path, 'w') as f:
+        f.write(contents)
+    os.utime(path, (OLD_TIME, OLD_TIME))
+    return path
+
+
+def read_file(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_unchanged_write():
+    folder = tempfile.mkdtemp()
+    try:
+        path = write_cmake(folder)
+        cmake = parse_file(path)
+        assert not cmake.is_changed()
+        assert str(cmake) == CMAKE
+        assert not cmake.write()
+        assert os.path.getmtime(path) == OLD_TIME
+        assert read_file(path) == CMAKE
+
+        # Writing to another file still writes the contents
+        copy_path = os.path.join(folder, 'copy.txt')
+        assert cmake.write(copy_path)
+        assert read_file(copy_path) == CMAKE
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_changed_write():
+    folder = tempfile.mkdtemp()
+    try:
+        # A modified section
+        path = write_cmake(folder)
+        cmake = parse_file(path)
+        cmake.content_map['find_package'][0].get_section('COMPONENTS').add('geometry_msgs')
+        assert cmake.is_changed()
+        assert cmake.write()
+        assert 'geometry_msgs' in read_file(path)
+        assert os.path.getmtime(path) != OLD_TIME
+
+        # A modified command inside of a group
+        path = write_cmake(folder)
+        cmake = parse_file(path)
+        group = cmake.content_map['group'][0]
+        group.sub.content_map['find_package'][0].add_section('COMPONENTS', ['rosunit'])
+        assert cmake.is_changed()
+        assert cmake.write()
+        assert 'find_package(rostest REQUIRED COMPONENTS rosunit)' in read_file(path)
+
+        # An added command
+        path = write_cmake(folder)
+        cmake = parse_file(path)
+        cmake.add_command(parse_command('catkin_package()'))
+        assert cmake.is_changed()
+        assert cmake.write()
+        assert 'catkin_package()' in read_file(path)
+
+        # A removed command
+        path = write_cmake(folder)
+        cmake = parse_file(path)
+        cmake.remove_command(cmake.content_map['find_package'][0])
+        assert cmake.is_changed()
+        assert cmake.write()
+        assert 'roscpp' not in read_file(path)
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,36 @@
+import os
+
+from ros_introspection.package_crawler import crawl
+
+from workspace_helpers import make_file, make_package, temp_workspace
+
+
+def crawl_relative(root):
+    return [(os.path.relpath(package_root, root), filenames) for package_root, filenames in crawl(root)]
+
+
+def test_crawl_pruning():
+    with temp_workspace() as root:
+        make_package(root, 'src/alpha', {'src/main.cpp': '', '.git/config': ''})
+        # Packages inside packages, build folders and version control folders are not crawled
+        make_package(root, 'src/alpha/test/nested')
+        make_package(root, 'build/alpha')
+        make_package(root, 'src/.git/hidden')
+        make_package(root, 'src/group/beta')
+
+        packages = crawl_relative(root)
+        assert [package_root for package_root, filenames in packages] == ['src/alpha', 'src/group/beta']
+        alpha_files = packages[0][1]
+        assert sorted(alpha_files) == ['package.xml', 'src/main.cpp', 'test/nested/package.xml']
+
+
+def test_crawl_ignore_markers():
+    with temp_workspace() as root:
+        make_package(root, 'src/alpha')
+        for i, marker in enumerate(['CATKIN_IGNORE', 'COLCON_IGNORE', 'AMENT_IGNORE']):
+            # A marker in a parent folder or in the package folder itself skips the package
+            make_package(root, 'src/ignored_group%d/gamma' % i)
+            make_file(root, 'src/ignored_group%d/%s' % (i, marker))
+            make_package(root, 'src/ignored_package%d' % i, {marker: ''})
+
+        assert [package_root for package_root, filenames in crawl_relative(root)] == ['src/alpha']
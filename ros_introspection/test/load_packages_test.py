@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from ros_introspection.package import COMPONENTS
+from ros_introspection.package_crawler import crawl
+from ros_introspection.util import load_packages
+
+from workspace_helpers import make_file, make_package, temp_workspace
+
+CMAKE = """cmake_minimum_required(VERSION 3.0.2)
+project(%s)
+find_package(catkin REQUIRED COMPONENTS roscpp)
+catkin_package()
+add_executable(%s_node src/main.cpp)
+"""
+
+
+def make_workspace(root):
+    for name in ['alpha', 'beta', 'gamma']:
+        make_package(root, 'src/' + name, {'CMakeLists.txt': CMAKE % (name, name),
+                                           'src/main.cpp': '#include <ros/ros.h>\nint main() {}\n',
+                                           'launch/%s.launch' % name: '<launch/>\n'})
+    make_package(root, 'src/broken_cmake', {'CMakeLists.txt': 'project(broken_cmake\n'})
+    make_file(root, 'src/broken_manifest/package.xml', '<package format="2"><name>broken')
+
+
+def describe(packages):
+    return [(package.name, str(package.cmake), sorted(package.source_code.sources), len(package.launches))
+            for package in packages]
+
+
+def test_load_packages_is_lazy(capsys):
+    with temp_workspace() as root:
+        make_workspace(root)
+        packages = load_packages(crawl(root))
+
+        # Only the manifests are parsed, so only the broken manifest is reported
+        assert [package.name for package in packages] == ['alpha', 'beta', 'broken_cmake', 'gamma']
+        assert 'Trouble parsing package @ %s' % os.path.join(root, 'src', 'broken_manifest') in capsys.readouterr().err
+        for package in packages:
+            assert [component for component in COMPONENTS if package.is_loaded(component)] == []
+
+        # The other components are parsed when used
+        assert packages[0].cmake.get_project_name() == 'alpha'
+        assert packages[0].is_loaded('cmake') and not packages[0].is_loaded('source_code')
+        with pytest.raises(Exception):
+            packages[2].cmake
+
+
+def test_load_packages_jobs(capsys):
+    with temp_workspace() as root:
+        make_workspace(root)
+        listings = crawl(root)
+        serial = load_packages(listings, jobs=1)
+        capsys.readouterr()
+        parallel = load_packages(listings, jobs=2)
+        errors = capsys.readouterr().err
+
+        # The workers parse every component, so the broken CMakeLists is found while loading
+        assert 'Trouble parsing package @ %s' % os.path.join(root, 'src', 'broken_cmake') in errors
+        assert [package.name for package in parallel] == ['alpha', 'beta', 'gamma']
+        for package in parallel:
+            assert all(package.is_loaded(component) for component in COMPONENTS)
+        assert describe(parallel) == describe(package for package in serial if package.name != 'broken_cmake')
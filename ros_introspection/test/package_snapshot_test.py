@@ -0,0 +1,56 @@
+import os
+
+from ros_introspection.cmake_parser import parse_command
+from ros_introspection.package import Package
+
+from workspace_helpers import make_package, temp_workspace
+
+CMAKE = """cmake_minimum_required(VERSION 3.0.2)
+project(alpha)
+find_package(catkin REQUIRED)
+catkin_package()
+"""
+
+
+def make_alpha(root):
+    make_package(root, 'alpha', {'CMakeLists.txt': CMAKE, 'src/main.cpp': '#include <ros/ros.h>\n'})
+    return Package(os.path.join(root, 'alpha'))
+
+
+def test_snapshot_is_independent():
+    with temp_workspace() as root:
+        package = make_alpha(root)
+        package.cmake
+        snapshot = package.snapshot()
+        assert snapshot.is_loaded('cmake') and not snapshot.is_loaded('source_code')
+
+        # Changes to the original after the snapshot was taken don't show up in the snapshot
+        package.cmake.add_command(parse_command('add_definitions(-DORIGINAL)'))
+        package.manifest.root.setAttribute('format', '3')
+        assert 'ORIGINAL' not in str(snapshot.cmake)
+        assert snapshot.manifest.root.getAttribute('format') == '2'
+
+        # And the other way around
+        snapshot.cmake.add_command(parse_command('add_definitions(-DSNAPSHOT)'))
+        assert 'SNAPSHOT' not in str(package.cmake)
+
+        # Components that were not loaded when the snapshot was taken are parsed from disk
+        package.source_code.sources['src/main.cpp'].replace_contents('#include <std_msgs/String.h>\n')
+        assert snapshot.source_code.sources['src/main.cpp'].get_contents() == '#include <ros/ros.h>\n'
+
+        # Nothing was written
+        assert str(Package(package.root).cmake) == CMAKE
+
+
+def test_snapshot_of_snapshot():
+    with temp_workspace() as root:
+        package = make_alpha(root)
+        first = package.snapshot()
+        first.cmake.add_command(parse_command('add_definitions(-DFIRST)'))
+        second = first.snapshot()
+        first.cmake.add_command(parse_command('add_definitions(-DLATER)'))
+
+        assert 'FIRST' in str(second.cmake)
+        assert 'LATER' not in str(second.cmake)
+        assert not package.is_loaded('cmake')
+        assert 'FIRST' not in str(package.cmake)
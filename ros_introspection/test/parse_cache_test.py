@@ -0,0 +1,38 @@
+import os
+
+from ros_introspection.parse_cache import disable_cache, enable_cache
+from ros_introspection.source_code import SourceCode
+
+from workspace_helpers import make_file, temp_workspace
+
+SOURCE = '#include <ros/ros.h>\n#include <std_msgs/String.h>\n'
+
+
+def get_source(root):
+    return SourceCode({'src/main.cpp': os.path.join(root, 'src/main.cpp')}, 'my_pkg').sources['src/main.cpp']
+
+
+def test_cached_import_packages():
+    with temp_workspace() as root:
+        make_file(root, 'src/main.cpp', SOURCE)
+        enable_cache(os.path.join(root, 'cache'))
+        try:
+            source = get_source(root)
+            assert source.get_import_packages() == ['ros', 'roscpp', 'std_msgs']
+            assert source.contents is not None
+
+            # The cached imports are used without reading the file again
+            source = get_source(root)
+            assert source.get_import_packages() == ['ros', 'roscpp', 'std_msgs']
+            assert source.contents is None
+
+            # Until it changes
+            make_file(root, 'src/main.cpp', SOURCE + '#include <geometry_msgs/Pose.h>\n')
+            source = get_source(root)
+            assert source.get_import_packages() == ['geometry_msgs', 'ros', 'roscpp', 'std_msgs']
+
+            # Changes that have not been written yet are scanned directly
+            source.replace_contents('import rospy\n')
+            assert source.get_import_packages() == ['rospy']
+        finally:
+            disable_cache()
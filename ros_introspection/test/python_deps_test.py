@@ -0,0 +1,26 @@
+import time
+
+from ros_introspection.resource_list import PY_DEP_MAX_AGE, PY_DEP_RETRY_DELAY, PY_DEP_URL, PythonDependencies
+
+
+def test_python_deps_index():
+    deps = PythonDependencies(['python-yaml', 'python3-numpy', 'python-requests'])
+    assert deps.get('yaml') == 'python-yaml'
+    assert deps.get('numpy') == 'python3-numpy'
+    assert deps.get('python-requests') == 'python-requests'
+    assert deps.get('not_a_dependency') is None
+
+
+def test_python_deps_staleness():
+    now = time.time()
+    old = now - PY_DEP_MAX_AGE.total_seconds() - 60
+    assert not PythonDependencies([], source=PY_DEP_URL).is_stale()
+    assert PythonDependencies([], source=PY_DEP_URL, updated=old).is_stale()
+
+    # A recent attempt to update it (that failed) delays the next one
+    assert not PythonDependencies([], source=PY_DEP_URL, updated=old, attempted=now).is_stale()
+    retried = now - PY_DEP_RETRY_DELAY.total_seconds() - 60
+    assert PythonDependencies([], source=PY_DEP_URL, updated=old, attempted=retried).is_stale()
+
+    # Indexes built from a local python.yaml are never replaced by a download
+    assert not PythonDependencies([], source='/opt/rosdistro/rosdep/python.yaml', updated=old).is_stale()
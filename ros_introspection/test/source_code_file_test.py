@@ -0,0 +1,112 @@
+import os
+import re
+import shutil
+import tempfile
+
+from ros_introspection import source_code_file
+from ros_introspection.source_code_file import IMPORT_PATTERNS, SourceCodeFile, get_required_literal
+
+SOURCE = """#include <ros/ros.h>
+#include "my_pkg/header.h"
+#include <geometry_msgs/msg/pose.hpp>
+  #include<std_msgs/String.h>   // indented
+// #include <commented/out.h>
+import rospy
+import os.path
+from sensor_msgs.msg import Image, CameraInfo
+from . import sibling
+std::string s = "ros.h #include #include <a/b.h>";
+ros::NodeHandle nh; ros::Publisher pub = nh.advertise<std_msgs::String>("chatter", 1);
+ROS_INFO("from here import there");
+ROS_INFO("ROS_INFO ROS_INFO");
+last line without a newline ROS_WARN"""
+
+PATTERNS = [re.compile(p) for p in [r'ROS_INFO', r'ROS_(INFO|WARN)', r'ros::(\w+)', r'nh\.advertise<([^>]+)>',
+                                    r'^std::string (\w+)', r'.*without', r'(?i)ros_warn', r'#include\s*"']]
+
+
+def full_scan(contents, patterns):
+    """The (pattern index, groups) found by running every pattern on every line, without any prefiltering."""
+    matches = []
+    for line in contents.split('\n'):
+        line = line.strip()
+        for i, pattern in enumerate(patterns):
+            m = pattern.search(line)
+            if m:
+                matches.append((i, m.groups()))
+    return matches
+
+
+def make_source_file(contents):
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'source.cpp')
+    with open(path, 'w') as f:
+        f.write(contents)
+    return folder, SourceCodeFile('source.cpp', path)
+
+
+def test_required_literals():
+    assert get_required_literal(re.compile(r'#include\s*<ros/ros.h>')) == '#include'
+    assert get_required_literal(re.compile(r'nh\.advertise<')) == 'nh.advertise<'
+    assert get_required_literal(re.compile(r'ROS_INFOS?')) == 'ROS_INFO'
+    assert get_required_literal(re.compile(r'ab.*')) is None
+    assert get_required_literal(re.compile(r'ROS_INFO|ROS_WARN')) is None
+    assert get_required_literal(re.compile(r'ros_info', re.IGNORECASE)) is None
+    # Every match contains the literal
+    for pattern in list(IMPORT_PATTERNS) + PATTERNS:
+        literal = get_required_literal(pattern)
+        for m in pattern.finditer(SOURCE):
+            assert literal is None or literal in m.group(0)
+
+    # The cache of literals doesn't grow without bound
+    for i in range(source_code_file.MAX_REQUIRED_LITERALS + 10):
+        get_required_literal(re.compile('pattern_%d' % i))
+    assert len(source_code_file.REQUIRED_LITERALS) == source_code_file.MAX_REQUIRED_LITERALS
+    assert get_required_literal(re.compile('pattern_0')) == 'pattern_0'
+
+
+def test_scan_lines_matches_full_scan():
+    folder, source_file = make_source_file(SOURCE)
+    try:
+        for patterns in [IMPORT_PATTERNS, PATTERNS, PATTERNS[:4], PATTERNS[2:3], PATTERNS[-2:]]:
+            assert list(source_file.scan_lines(patterns)) == full_scan(SOURCE, patterns)
+            # The cached results are the same, and can't be modified by the caller
+            assert list(source_file.scan_lines(patterns)) == full_scan(SOURCE, patterns)
+            assert isinstance(source_file.scan_lines(patterns), tuple)
+            expected_groups = [groups for i, groups in full_scan(SOURCE, patterns)]
+            assert source_file.search_lines_for_patterns(patterns) == expected_groups
+        imports = full_scan(SOURCE, IMPORT_PATTERNS)
+        roscpp_index = len(IMPORT_PATTERNS) - 1
+        assert source_file.get_import_packages() == sorted(set('roscpp' if i == roscpp_index else groups[0]
+                                                               for i, groups in imports))
+
+        # Replacing the contents clears the results
+        contents = SOURCE.replace('ROS_INFO', 'ROS_DEBUG')
+        source_file.replace_contents(contents)
+        assert list(source_file.scan_lines(PATTERNS)) == full_scan(contents, PATTERNS)
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_non_utf8_round_trip():
+    data = b'// Copyright \xa9 2020 J\xfcrgen\n#include <ros/ros.h>\nROS_INFO("caf\xe9");\n'
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, 'source.cpp')
+        with open(path, 'wb') as f:
+            f.write(data)
+        source_file = SourceCodeFile('source.cpp', path)
+        assert 'roscpp' in source_file.get_import_packages()
+        source_file.modify_with_patterns({'ROS_INFO': 'ROS_WARN'}, False)
+        assert source_file.write()
+        with open(path, 'rb') as f:
+            assert f.read() == data.replace(b'ROS_INFO', b'ROS_WARN')
+
+        # Binary files are still skipped
+        with open(path, 'wb') as f:
+            f.write(data + b'\0')
+        source_file = SourceCodeFile('source.cpp', path)
+        assert source_file.get_contents() == ''
+        assert source_file.search_lines_for_pattern(re.compile('ROS_INFO')) == []
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,32 @@
+"""Building temporary workspaces for the tests."""
+import contextlib
+import os
+import shutil
+import tempfile
+
+MANIFEST = '<package format="2"><name>%s</name><buildtool_depend>catkin</buildtool_depend></package>\n'
+
+
+def make_file(root, path, contents=''):
+    path = os.path.join(root, path)
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(contents)
+
+
+def make_package(root, folder, files=None):
+    """Make a package (named after the folder) with a minimal manifest and the given {path: contents} files."""
+    make_file(root, os.path.join(folder, 'package.xml'), MANIFEST % os.path.basename(folder))
+    for path, contents in (files or {}).items():
+        make_file(root, os.path.join(folder, path), contents)
+
+
+@contextlib.contextmanager
+def temp_workspace():
+    """Yield a new temporary folder, which is removed afterwards."""
+    root = tempfile.mkdtemp()
+    try:
+        yield root
+    finally:
+        shutil.rmtree(root)
@@ -2,6 +2,7 @@ from ros_introspection.cmake import Command, CommandGroup
 from ros_introspection.resource_list import is_message, is_service
 from ros_introspection.source_code_file import CPLUS
 
+from .scheduler import get_analysis
 from .util import get_config, get_ignore_data, roscompile
 
 SHOULD_ALPHABETIZE = ['COMPONENTS', 'DEPENDENCIES', 'FILES', 'CATKIN_DEPENDS']
@@ -38,12 +39,12 @@ def check_cmake_dependencies_helper(cmake, dependencies, check_catkin_pkg=True):
         cmake.section_check(dependencies, 'catkin_package', 'CATKIN_DEPENDS')
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code', 'generators'], writes=['cmake'], requires=['cmake'])
 def check_cmake_dependencies(package):
     if not package.cmake:
         return
-    dependencies = package.get_dependencies_from_msgs()
-    dependencies.update(package.get_build_dependencies())
+    dependencies = get_analysis(package, 'msg_dependencies')
+    dependencies.update(get_analysis(package, 'build_dependencies'))
     check_cmake_dependencies_helper(package.cmake, dependencies)
 
 
@@ -87,7 +88,8 @@ def get_msg_dependencies_from_source(package, sources):
     return sorted(deps)
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code', 'generators', 'dynamic_reconfigs'], writes=['cmake'],
+            requires=['cmake'])
 def check_exported_dependencies(package):
     if not package.cmake:
         return
@@ -139,7 +141,8 @@ def remove_pattern(section, pattern):
     return prev_len != len(section.values)
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code', 'generators', 'dynamic_reconfigs'], writes=['cmake'],
+            requires=['cmake'])
 def remove_old_style_cpp_dependencies(package):
     if not package.cmake:
         return
@@ -161,7 +164,7 @@ def remove_old_style_cpp_dependencies(package):
         check_exported_dependencies(package)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def target_catkin_libraries(package):
     if not package.cmake:
         return
@@ -183,7 +186,7 @@ def target_catkin_libraries(package):
         package.cmake.add_command(cmd)
 
 
-@roscompile
+@roscompile(reads=['cmake', 'generators'], writes=['cmake'], requires=['cmake', 'generators'])
 def check_generators(package):
     if len(package.generators) == 0 or not package.cmake:
         return
@@ -202,7 +205,7 @@ def check_generators(package):
             section.values.remove('message_generation')
             cmd.changed = True
 
-    msg_deps = package.get_dependencies_from_msgs()
+    msg_deps = get_analysis(package, 'msg_dependencies')
     if msg_deps:
         package.cmake.section_check(msg_deps, 'generate_messages',
                                     'DEPENDENCIES', zero_okay=True)
@@ -211,7 +214,7 @@ def check_generators(package):
                                     zero_okay=True)
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code'], writes=['cmake'], requires=['cmake'])
 def check_includes(package):
     if not package.cmake or not package.source_code.get_source_by_language('c++'):
         return
@@ -231,7 +234,7 @@ def check_includes(package):
             package.cmake.remove_command(cmd)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def check_library_setup(package):
     if not package.cmake:
         return
@@ -251,14 +254,14 @@ def alphabetize_sections_helper(cmake):
             alphabetize_sections_helper(content.sub)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def alphabetize_sections(package):
     if not package.cmake:
         return
     alphabetize_sections_helper(package.cmake)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def prettify_catkin_package_cmd(package):
     if not package.cmake:
         return
@@ -268,7 +271,7 @@ def prettify_catkin_package_cmd(package):
         cmd.changed = True
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def prettify_package_lists(package):
     if not package.cmake:
         return
@@ -288,7 +291,7 @@ def prettify_package_lists(package):
                         cmd.changed = True
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def prettify_msgs_srvs(package):
     if not package.cmake:
         return
@@ -300,7 +303,7 @@ def prettify_msgs_srvs(package):
             cmd.changed = True
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def prettify_installs(package):
     if not package.cmake:
         return
@@ -355,7 +358,7 @@ def remove_cmake_comments_helper(cmake, ignorables, replacement=''):
     cmake.contents = remove_empty_strings(cmake.contents)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def remove_boilerplate_cmake_comments(package):
     if not package.cmake:
         return
@@ -364,7 +367,7 @@ def remove_boilerplate_cmake_comments(package):
     remove_empty_cmake_lines(package)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def remove_empty_cmake_lines(package):
     if not package.cmake:
         return
@@ -374,7 +377,7 @@ def remove_empty_cmake_lines(package):
     package.cmake.contents = remove_empty_strings(package.cmake.contents)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def enforce_cmake_ordering(package, config=None):
     if not package.cmake:
         return
@@ -3,15 +3,24 @@
 import collections
 import difflib
 import inspect
+import io
 import os
 import shutil
 import tempfile
 from filecmp import dircmp
 
+from ros_introspection.file_writer import capture_writes
 from ros_introspection.package import Package
+from ros_introspection.profiler import measure
 from ros_introspection.util import get_sibling_packages
 
 from .terminal import color_diff, color_header
+from .util import get_signature
+
+try:
+    getargspec = inspect.getfullargspec
+except AttributeError:  # Python 2
+    getargspec = inspect.getargspec
 
 
 def get_diff_helper(dcmp, folder=''):
@@ -42,6 +51,18 @@ def get_lines(folder, filename):
     return open(os.path.join(folder, filename)).readlines()
 
 
+def get_data_lines(data):
+    """Split the (captured) contents of a file into lines. None (a deleted file) has no lines."""
+    if data is None:
+        return []
+    return io.StringIO(data.decode('utf-8'), newline=None).readlines()
+
+
+def print_lines_diff(filename, left, right):
+    diff = difflib.unified_diff(left, right, fromfile=filename, tofile='%s (modified)' % filename)
+    print(''.join(color_diff(diff)))
+
+
 def print_diff(filename, left_folder=None, right_folder=None):
     if left_folder is None:
         left = []
@@ -53,11 +74,29 @@ def print_diff(filename, left_folder=None, right_folder=None):
     else:
         right = get_lines(right_folder, filename)
 
-    diff = difflib.unified_diff(left, right, fromfile=filename, tofile='%s (modified)' % filename)
-    print(''.join(color_diff(diff)))
+    print_lines_diff(filename, left, right)
 
 
-def preview_changes(package, fn_name, fne, use_package_name=False):
+def print_preview_header(package, fn_name, use_package_name):
+    if use_package_name:
+        print(color_header(fn_name + ' (' + package.name + ')'))
+    else:
+        print(color_header(fn_name))
+
+
+def get_path_sort_key(filename):
+    # Same order as get_diff: the files in a folder, then each of its subfolders
+    parts = filename.split(os.sep)
+    return [(1, part) for part in parts[:-1]] + [(0, parts[-1])]
+
+
+def changes_files_directly(fn_name):
+    """Return whether the roscompile function may change files on disk itself (instead of via package.write)."""
+    writes = get_signature(fn_name).writes
+    return writes is None or 'files' in writes
+
+
+def preview_changes_on_disk(package, fn_name, fne, use_package_name=False):
     try:
         temp_dir = tempfile.mkdtemp()
         new_package_root = os.path.join(temp_dir, package.name)
@@ -67,19 +106,17 @@ def preview_changes(package, fn_name, fne, use_package_name=False):
         # Special case for metapackage rules, since the sibling packages
         # require knowing the names of packages outside of the package's file root
         # thus will not be copied with the above copytree operation
-        if 'sibling_packages' in inspect.getargspec(fne).args:
-            fne(new_pkg, sibling_packages=get_sibling_packages(package))
-        else:
-            fne(new_pkg)
+        with measure('fix', fn_name, package.root):
+            if 'sibling_packages' in getargspec(fne).args:
+                fne(new_pkg, sibling_packages=get_sibling_packages(package))
+            else:
+                fne(new_pkg)
         new_pkg.write()
         the_diff = get_diff(package.root, new_package_root)
         if len(the_diff) == 0:
             return False
 
-        if use_package_name:
-            print(color_header(fn_name + ' (' + package.name + ')'))
-        else:
-            print(color_header(fn_name))
+        print_preview_header(package, fn_name, use_package_name)
 
         for filename in the_diff.get('diff', []):
             print_diff(filename, package.root, new_package_root)
@@ -88,12 +125,49 @@ def preview_changes(package, fn_name, fne, use_package_name=False):
         for filename in the_diff.get('added', []):
             print_diff(filename, right_folder=new_package_root)
     finally:
-        shutil.rmtree(new_package_root)
-        shutil.copytree(package.root, new_package_root)
         shutil.rmtree(temp_dir)
     return True
 
 
+def preview_changes_in_memory(package, fn_name, fne, use_package_name=False):
+    """Run the function on a snapshot of the package and print the diff of each file it would change.
+
+    Only the files whose new contents differ from the files on disk are read and diffed.
+    """
+    new_pkg = package.snapshot()
+    with measure('fix', fn_name, package.root):
+        fne(new_pkg)
+    with capture_writes() as writes:
+        new_pkg.write()
+    if len(writes) == 0:
+        return False
+
+    print_preview_header(package, fn_name, use_package_name)
+
+    changed = {}
+    for path, data in writes.contents.items():
+        changed[os.path.relpath(path, package.root)] = get_data_lines(data)
+    filenames = sorted(changed, key=get_path_sort_key)
+    for filename in filenames:
+        if os.path.exists(os.path.join(package.root, filename)):
+            print_lines_diff(filename, get_lines(package.root, filename), changed[filename])
+    for filename in filenames:
+        if not os.path.exists(os.path.join(package.root, filename)):
+            print_lines_diff(filename, [], changed[filename])
+    return True
+
+
+def preview_changes(package, fn_name, fne, use_package_name=False):
+    """Print the changes that the roscompile function would make to the package, returning whether there are any.
+
+    Functions that only change the package's components are previewed in memory. Functions that may change
+    files directly (e.g. deleting them) are previewed by running them on a copy of the package folder.
+    """
+    if changes_files_directly(fn_name):
+        return preview_changes_on_disk(package, fn_name, fne, use_package_name)
+    return preview_changes_in_memory(package, fn_name, fne, use_package_name)
+
+
 def prepare_diff_lines(string_a, string_b):
     a_lines = string_a.split('\n')
     b_lines = string_b.split('\n')
@@ -0,0 +1,90 @@
+import multiprocessing
+import sys
+import traceback
+
+from ros_introspection.profiler import imap_profiled
+from ros_introspection.util import load_package
+
+from .scheduler import run_scheduled
+
+try:
+    from StringIO import StringIO
+except ImportError:  # Python 3
+    from io import StringIO
+
+
+def run_functions(package, skip_fixes=()):
+    """Run the roscompile functions (except the skipped ones) on the package, and then write it.
+
+    Returns the paths of the files that were written.
+    """
+    run_scheduled(package, skip_fixes=skip_fixes)
+    return package.write()
+
+
+def run_package_task(task):
+    """Load and fix the package in a (root, filenames, skip_fixes) task. Module-level so it can be sent to workers.
+
+    Returns a (root, printed output, written files, error message) tuple.
+    """
+    root, filenames, skip_fixes = task
+    written = []
+    error = None
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        _, package, load_error = load_package(root, filenames)
+        if load_error:
+            error = 'ERROR: Trouble parsing package @ %s\n%s' % (root, load_error)
+        else:
+            written = run_functions(package, skip_fixes)
+    except Exception:
+        error = 'ERROR: Trouble running roscompile on package @ %s\n%s' % (root, traceback.format_exc())
+    finally:
+        output = sys.stdout.getvalue()
+        sys.stdout = stdout
+    return root, output, written, error
+
+
+def map_tasks(fne, tasks, jobs=None):
+    """Yield fne(task) for each task, in order, computing them in worker processes unless jobs is 1.
+
+    fne must be a module-level function so it can be sent to the workers.
+    If jobs is None or 0, one process per available core is used.
+    """
+    if jobs == 1:
+        for task in tasks:
+            yield fne(task)
+        return
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+    if not tasks:
+        return
+
+    pool = multiprocessing.Pool(min(jobs, len(tasks)))
+    try:
+        for result in imap_profiled(pool, fne, tasks):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_in_parallel(listings, skip_fixes=(), jobs=None):
+    """Load and fix each (root, filenames) listing in worker processes (or in this process, if jobs is 1).
+
+    The output printed while fixing each package is printed here once the package is done, in the same order
+    as the listings, so the output does not depend on which worker finishes first.
+    If jobs is None or 0, one process per available core is used.
+
+    Returns a list of (root, written files, error message) tuples.
+    """
+    tasks = [(root, filenames, list(skip_fixes)) for root, filenames in listings]
+    results = []
+    for root, output, written, error in map_tasks(run_package_task, tasks, jobs):
+        sys.stdout.write(output)
+        sys.stdout.flush()
+        if error:
+            sys.stderr.write(error)
+        results.append((root, written, error))
+    return results
@@ -7,7 +7,7 @@ STANDARD = {
 }
 
 
-@roscompile
+@roscompile(reads=['generators'], writes=['generators'], requires=['generators'])
 def fill_in_msg_package_names(package):
     all_names = set()
     gens = list(package.get_all_generators())
@@ -27,7 +27,7 @@ def fill_in_msg_package_names(package):
                     gen.changed = True
 
 
-@roscompile
+@roscompile(reads=['generators'], writes=['generators'], requires=['generators'])
 def remove_trailing_whitespace_from_generators(package):
     for gen in package.get_all_generators():
         for i, content in enumerate(gen.contents):
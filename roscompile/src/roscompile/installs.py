@@ -192,7 +192,7 @@ def install_section_check(cmake, items, install_type, directory=False, subfolder
         cmd.changed = True
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code'], writes=['cmake'], requires=['cmake'])
 def update_cplusplus_installs(package):
     install_section_check(package.cmake, package.cmake.get_executables(), 'exec')
     install_section_check(package.cmake, package.cmake.get_libraries(), 'library')
@@ -200,7 +200,8 @@ def update_cplusplus_installs(package):
         install_section_check(package.cmake, ['include/${PROJECT_NAME}/'], 'headers', directory=True)
 
 
-@roscompile
+@roscompile(reads=['cmake', 'launches', 'plugin_configs', 'urdf_files', 'misc_files'], writes=['cmake'],
+            requires=['cmake'])
 def update_misc_installs(package):
     extra_files_by_folder = collections.defaultdict(list)
     rel_paths = [obj.rel_fn for obj in package.launches + package.plugin_configs + package.urdf_files]
@@ -215,7 +216,7 @@ def update_misc_installs(package):
         install_section_check(package.cmake, files, 'misc', subfolder=folder)
 
 
-@roscompile
+@roscompile(reads=['cmake'], writes=['cmake'], requires=['cmake'])
 def fix_double_directory_installs(package):
     for cmd in package.cmake.content_map['install']:
         dir_section = cmd.get_section('DIRECTORY')
@@ -1,17 +1,19 @@
 from ros_introspection.package_xml import count_trailing_spaces, get_ordering_index, replace_package_set
 
+from .scheduler import get_analysis
 from .util import get_config, get_ignore_data, roscompile
 
 
-@roscompile
+@roscompile(reads=['manifest', 'source_code', 'launches', 'urdf_files', 'rviz_configs', 'generators'],
+            writes=['manifest'])
 def check_manifest_dependencies(package):
-    build_depends = package.get_build_dependencies()
-    run_depends = package.get_run_dependencies()
-    test_depends = package.get_test_dependencies()
+    build_depends = get_analysis(package, 'build_dependencies')
+    run_depends = get_analysis(package, 'run_dependencies')
+    test_depends = get_analysis(package, 'test_dependencies')
     package.manifest.add_packages(build_depends, run_depends, test_depends)
 
     if package.generators:
-        md = package.get_dependencies_from_msgs()
+        md = get_analysis(package, 'msg_dependencies')
         package.manifest.add_packages(md, md)
 
         if package.manifest.format == 1:
@@ -28,9 +30,9 @@ def check_manifest_dependencies(package):
                 package.manifest.insert_new_packages(tag, [msg_pkg])
 
 
-@roscompile
+@roscompile(reads=['manifest', 'source_code'], writes=['manifest'])
 def check_python_dependencies(package):
-    run_depends = package.source_code.get_external_python_dependencies()
+    run_depends = get_analysis(package, 'external_python_dependencies')
     package.manifest.add_packages(set(), run_depends, prefer_depend_tag=False)
 
 
@@ -41,7 +43,7 @@ def has_element_child(node):
     return False
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def remove_empty_export_tag(package):
     exports = package.manifest.root.getElementsByTagName('export')
     if len(exports) == 0:
@@ -52,7 +54,7 @@ def remove_empty_export_tag(package):
             return True
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def greedy_depend_tag(package):
     if package.manifest.format == 1:
         return
@@ -100,7 +102,7 @@ def enforce_tabbing_helper(manifest, node, tabs=1):
         manifest.changed = True
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def enforce_manifest_tabbing(package):
     enforce_tabbing_helper(package.manifest, package.manifest.root)
 
@@ -138,7 +140,7 @@ def get_chunks(children):
     return chunks
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def enforce_manifest_ordering(package, alphabetize=True):
     root = package.manifest.root
     chunks = get_chunks(root.childNodes)
@@ -204,7 +206,7 @@ def replace_text_node_contents(node, ignorables):
     return changed
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def remove_boilerplate_manifest_comments(package):
     ignorables = get_ignore_data('package', {'package': package.name}, add_newline=False)
     changed = replace_text_node_contents(package.manifest.root, ignorables)
@@ -225,13 +227,13 @@ def remove_empty_lines_helper(node):
     return changed
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def remove_empty_manifest_lines(package):
     if remove_empty_lines_helper(package.manifest.root):
         package.manifest.changed = True
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def update_people(package, config=None):
     if config is None:
         config = get_config()
@@ -240,7 +242,7 @@ def update_people(package, config=None):
                                        d['from'].get('name', None), d['from'].get('email', None))
 
 
-@roscompile
+@roscompile(reads=['manifest'], writes=['manifest'])
 def update_license(package, config=None):
     if config is None:
         config = get_config()
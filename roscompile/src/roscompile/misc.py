@@ -2,6 +2,7 @@ import os
 import re
 import yaml
 
+from ros_introspection.file_writer import remove_file
 from ros_introspection.rviz_config import dictionary_subtract
 from ros_introspection.util import get_sibling_packages
 
@@ -15,7 +16,8 @@ RVIZ_GLOBAL_DEFAULTS = yaml.safe_load(open(PKG_PATH + '/data/rviz_global_default
 ROBOT_MODEL_LINK_DEFAULTS = {'Alpha': 1, 'Show Axes': False, 'Show Trail': False, 'Value': True}
 
 
-@roscompile
+@roscompile(reads=['manifest', 'cmake', 'dynamic_reconfigs'], writes=['manifest', 'cmake', 'files'],
+            requires=['cmake', 'dynamic_reconfigs'])
 def check_dynamic_reconfigure(package):
     cfgs = package.dynamic_reconfigs
     if len(cfgs) == 0:
@@ -29,7 +31,7 @@ def check_dynamic_reconfigure(package):
         make_executable(os.path.join(package.root, fn))
 
 
-@roscompile
+@roscompile(reads=['misc_files'], writes=['files'])
 def remove_useless_files(package):
     mainpage_pattern = re.compile(MAINPAGE_S % package.name)
     for fn in package.misc_files:
@@ -37,10 +39,10 @@ def remove_useless_files(package):
             full_path = os.path.join(package.root, fn)
             s = open(full_path).read()
             if mainpage_pattern.match(s):
-                os.remove(full_path)
+                remove_file(full_path)
 
 
-@roscompile
+@roscompile(reads=['manifest', 'cmake', 'files'], writes=['manifest', 'cmake'], requires=['cmake'])
 def update_metapackage(package, sibling_packages=None, require_matching_name=False):
     # Check if there is indication in package.xml or CMake of being a metapackage
     if not package.is_metapackage():
@@ -75,14 +77,14 @@ def update_metapackage(package, sibling_packages=None, require_matching_name=Fal
         package.manifest.insert_new_tag_inside_another(export_tag, meta_tag)
 
 
-@roscompile
+@roscompile(reads=['manifest', 'plugin_configs'], writes=['manifest', 'plugin_configs'])
 def misc_xml_formatting(package):
     package.manifest.changed = True
     for config in package.plugin_configs:
         config.changed = True
 
 
-@roscompile
+@roscompile(reads=['rviz_configs'], writes=['rviz_configs'], requires=['rviz_configs'])
 def clean_up_rviz_configs(package):
     for rviz_config in package.rviz_configs:
         for config in rviz_config.get_class_dicts():
@@ -32,7 +32,8 @@ def lookup_library(build_rules, rel_fn):
             return library
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code', 'manifest', 'plugin_configs'], writes=['manifest', 'plugin_configs'],
+            requires=['cmake'])
 def check_plugins(package):
     """Check that all the plugins are properly defined.
 
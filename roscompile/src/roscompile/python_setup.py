@@ -19,7 +19,7 @@ def has_python_library(package):
     return False
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code', 'setup_py'], writes=['cmake', 'setup_py'], requires=['cmake'])
 def check_setup_py(package):
     if not has_python(package):
         return
@@ -33,7 +33,7 @@ def check_setup_py(package):
         package.cmake.add_command(Command('catkin_python_setup'))
 
 
-@roscompile
+@roscompile(reads=['cmake', 'source_code'], writes=['cmake'], requires=['cmake'])
 def update_python_installs(package):
     execs = [source.rel_fn for source in package.source_code.get_source_by_language('python') if source.is_executable()]
     if len(execs) == 0:
@@ -0,0 +1,159 @@
+import difflib
+import json
+import os
+import stat
+import sys
+import time
+import traceback
+
+from ros_introspection.file_writer import capture_writes
+from ros_introspection.util import load_package
+
+from .diff import get_data_lines, get_path_sort_key
+from .executor import map_tasks
+from .scheduler import run_scheduled
+
+try:
+    from StringIO import StringIO
+except ImportError:  # Python 3
+    from io import StringIO
+
+
+def read_disk_contents(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def read_disk_mode(path):
+    if not os.path.exists(path):
+        return None
+    return stat.S_IMODE(os.lstat(path).st_mode)
+
+
+def format_change(path, old, new, old_mode, new_mode):
+    """Return a git-style unified diff of one file, given its old/new contents (None if missing) and modes."""
+    header = ['diff --git a/%s b/%s\n' % (path, path)]
+    if old is None:
+        header.append('new file mode 100%o\n' % (new_mode or 0o644))
+    elif new is None:
+        header.append('deleted file mode 100%o\n' % old_mode)
+    elif old_mode != new_mode:
+        header.append('old mode 100%o\n' % old_mode)
+        header.append('new mode 100%o\n' % new_mode)
+    fromfile = '/dev/null' if old is None else 'a/' + path
+    tofile = '/dev/null' if new is None else 'b/' + path
+    lines = difflib.unified_diff(get_data_lines(old), get_data_lines(new), fromfile=fromfile, tofile=tofile)
+    return ''.join(header) + ''.join(line if line.endswith('\n') else line + '\n' for line in lines)
+
+
+class FunctionRecorder:
+    """Called by run_scheduled after each roscompile function, to record how long it took and what it changed.
+
+    The package is written (into the captured writes) after each function, and compared to how the files
+    were after the previous function, so each change is attributed to the function that made it.
+    """
+
+    def __init__(self, package, captured, output):
+        self.package = package
+        self.captured = captured
+        self.output = output
+        self.contents = {}
+        self.modes = {}
+        self.functions = []
+        self.restart()
+
+    def restart(self):
+        self.output_start = self.output.tell()
+        self.start = time.time()
+
+    def get_changes(self):
+        changes = []
+        paths = set(self.contents) | set(self.modes) | set(self.captured.contents) | set(self.captured.modes)
+        for path in sorted(paths, key=get_path_sort_key):
+            old = self.contents[path] if path in self.contents else read_disk_contents(path)
+            new = self.captured.contents[path] if path in self.captured.contents else read_disk_contents(path)
+            old_mode = self.modes.get(path, read_disk_mode(path))
+            new_mode = self.captured.modes.get(path, read_disk_mode(path))
+            if old == new and old_mode == new_mode:
+                continue
+            if old is None:
+                status = 'added'
+            elif new is None:
+                status = 'deleted'
+            else:
+                status = 'modified'
+            rel_path = os.path.relpath(path)
+            changes.append({'path': rel_path, 'status': status,
+                            'diff': format_change(rel_path, old, new, old_mode, new_mode)})
+        return changes
+
+    def __call__(self, name):
+        seconds = time.time() - self.start
+        self.package.write()
+        self.functions.append({'name': name,
+                               'seconds': seconds,
+                               'output': self.output.getvalue()[self.output_start:],
+                               'changes': self.get_changes()})
+        self.contents = dict(self.captured.contents)
+        self.modes = dict(self.captured.modes)
+        self.restart()
+
+
+def get_package_report(task):
+    """Run the roscompile functions on the package in a (root, filenames, skip_fixes) task without changing any files.
+
+    Module-level so it can be sent to workers. Returns a dictionary with the package's name and root, the total
+    time, an error message (or None) and the name, time, printed output and changes of each function that ran.
+    """
+    root, filenames, skip_fixes = task
+    start = time.time()
+    report = {'root': os.path.relpath(root), 'package': None, 'functions': [], 'error': None}
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        with capture_writes() as captured:
+            _, package, load_error = load_package(root, filenames)
+            if load_error:
+                report['error'] = 'ERROR: Trouble parsing package @ %s\n%s' % (root, load_error)
+            else:
+                report['package'] = package.name
+                recorder = FunctionRecorder(package, captured, sys.stdout)
+                report['functions'] = recorder.functions
+                run_scheduled(package, skip_fixes=skip_fixes, callback=recorder)
+    except Exception:
+        report['error'] = 'ERROR: Trouble running roscompile on package @ %s\n%s' % (root, traceback.format_exc())
+    finally:
+        sys.stdout = stdout
+    report['seconds'] = time.time() - start
+    return report
+
+
+def get_reports(listings, skip_fixes=(), jobs=None):
+    """Return the report (see get_package_report) for each (root, filenames) listing, sorted by root."""
+    tasks = [(root, filenames, list(skip_fixes)) for root, filenames in sorted(listings)]
+    return list(map_tasks(get_package_report, tasks, jobs))
+
+
+def has_changes(reports):
+    return any(function['changes'] for report in reports for function in report['functions'])
+
+
+def print_diff_report(reports, stream=None):
+    """Print the changes of each function (preceded by a comment with the package, function and time) as a diff."""
+    stream = stream or sys.stdout
+    for report in reports:
+        if report['error']:
+            sys.stderr.write(report['error'])
+        for function in report['functions']:
+            if not function['changes']:
+                continue
+            stream.write('# %s: %s (%.1f ms)\n' % (report['package'], function['name'], function['seconds'] * 1000))
+            for change in function['changes']:
+                stream.write(change['diff'])
+
+
+def write_json_report(reports, stream):
+    json.dump({'changed': has_changes(reports), 'packages': reports}, stream, indent=2, sort_keys=True)
+    stream.write('\n')
@@ -0,0 +1,96 @@
+import copy
+
+from .util import get_signature, roscompile_functions, run_function
+
+# Analyses of the package that several roscompile functions use, mapped to (function, parts of the package read)
+ANALYSES = {
+    'build_dependencies': (lambda package: package.get_build_dependencies(), {'source_code'}),
+    'run_dependencies': (lambda package: package.get_run_dependencies(), {'launches', 'urdf_files', 'rviz_configs'}),
+    'test_dependencies': (lambda package: package.get_test_dependencies(), {'source_code', 'launches'}),
+    'msg_dependencies': (lambda package: package.get_dependencies_from_msgs(), {'generators'}),
+    'external_python_dependencies': (lambda package: package.source_code.get_external_python_dependencies(),
+                                     {'source_code'}),
+}
+
+# The analysis results for the packages currently being fixed by run_scheduled, keyed by id(package)
+ANALYSIS_CACHES = {}
+
+
+def get_analysis(package, name):
+    """Return (a copy of) the result of the named analysis of the package.
+
+    While run_scheduled is running on the package, each result is computed once and reused until one of the
+    functions writes to one of the parts of the package the analysis reads. Otherwise, it is computed every time.
+    """
+    fne, reads = ANALYSES[name]
+    cache = ANALYSIS_CACHES.get(id(package))
+    if cache is None:
+        return fne(package)
+    if name not in cache:
+        cache[name] = fne(package)
+    return copy.copy(cache[name])
+
+
+def invalidate_analyses(package, writes):
+    cache = ANALYSIS_CACHES.get(id(package))
+    if cache is None:
+        return
+    for name in list(cache):
+        if writes is None or ANALYSES[name][1] & writes:
+            del cache[name]
+
+
+def get_waves(names):
+    """Group the named roscompile functions into waves.
+
+    Each function goes in the wave after the last earlier function (in the given order) that it conflicts with,
+    so functions in the same wave don't depend on each other, and running the waves in order has the same
+    result as running the functions in the given order.
+    """
+    signatures = [get_signature(name) for name in names]
+    wave_indexes = []
+    for i, signature in enumerate(signatures):
+        wave_index = 0
+        for j in range(i):
+            if wave_indexes[j] >= wave_index and signature.conflicts_with(signatures[j]):
+                wave_index = wave_indexes[j] + 1
+        wave_indexes.append(wave_index)
+
+    waves = [[] for _ in range(max(wave_indexes) + 1)] if wave_indexes else []
+    for name, wave_index in zip(names, wave_indexes):
+        waves[wave_index].append(name)
+    return waves
+
+
+def has_required_parts(package, name):
+    for part in get_signature(name).requires:
+        if not getattr(package, part):
+            return False
+    return True
+
+
+def run_scheduled(package, names=None, skip_fixes=(), callback=None):
+    """Run the named roscompile functions (by default, all of them except skip_fixes) on the package.
+
+    The functions are run wave by wave (see get_waves), skipping functions whose required parts of the
+    package are missing, and sharing the analyses (see get_analysis) between the functions.
+    If given, callback is called with the name of each function right after it is run.
+    Returns the names of the functions that were run.
+    """
+    if names is None:
+        names = [name for name in roscompile_functions if name not in skip_fixes]
+    ran = []
+    ANALYSIS_CACHES[id(package)] = {}
+    try:
+        for wave in get_waves(names):
+            for name in wave:
+                if not has_required_parts(package, name):
+                    continue
+                run_function(name, package)
+                invalidate_analyses(package, get_signature(name).writes)
+                ran.append(name)
+                if callback:
+                    callback(name)
+    finally:
+        del ANALYSIS_CACHES[id(package)]
+    return ran
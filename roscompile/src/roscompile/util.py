@@ -3,6 +3,10 @@ import os
 import re
 import stat
 
+from ros_introspection.file_writer import get_mode, set_mode
+from ros_introspection.package import COMPONENTS
+from ros_introspection.profiler import measure
+
 import rospkg
 
 import yaml
@@ -13,13 +17,65 @@ PKG_PATH = rospkg.RosPack().get_path('roscompile')
 TRAILING_PATTERN = re.compile(r'^(.*[^\w])\w+\n$')
 
 roscompile_functions = collections.OrderedDict()
-
-
-def roscompile(f):
+roscompile_signatures = {}
+
+# The parts of a package that a roscompile function can declare that it reads/writes/requires.
+# 'files' covers changes made directly to the files in the package folder (and its siblings)
+PACKAGE_PARTS = ['manifest'] + COMPONENTS + ['files']
+# The parts that can be required, i.e. the attributes of the Package that can be missing/empty
+REQUIRABLE_PARTS = ['manifest'] + COMPONENTS
+
+
+class FixSignature:
+    """The parts of the package (see PACKAGE_PARTS) that a roscompile function reads, writes and requires.
+
+    If reads/writes is None, the function might read/write any part of the package.
+    The function is skipped if any of the required parts are missing/empty (e.g. package.cmake is None),
+    so 'files', which is not an attribute of the package, can't be required.
+    """
+
+    def __init__(self, reads=None, writes=None, requires=()):
+        for parts in [reads, writes, requires]:
+            for part in parts or []:
+                if part not in PACKAGE_PARTS:
+                    raise ValueError('Unknown package part "%s"' % part)
+        for part in requires:
+            if part not in REQUIRABLE_PARTS:
+                raise ValueError('The package part "%s" cannot be required' % part)
+        self.reads = None if reads is None else set(reads)
+        self.writes = None if writes is None else set(writes)
+        self.requires = list(requires)
+
+    def conflicts_with(self, other):
+        """Return whether the result could depend on which of the two functions runs first."""
+        if self.writes is None or other.writes is None or self.reads is None or other.reads is None:
+            return True
+        return bool(self.writes & (other.reads | other.writes) or other.writes & self.reads)
+
+
+def roscompile(f=None, reads=None, writes=None, requires=()):
+    """Register a function as one of the roscompile fixes.
+
+    Can be used bare (@roscompile) or with the parts of the package that the function uses, i.e.
+    @roscompile(reads=['cmake', 'source_code'], writes=['cmake'], requires=['cmake'])
+    """
+    if f is None:
+        return lambda f: roscompile(f, reads, writes, requires)
     roscompile_functions[f.__name__] = f
+    roscompile_signatures[f.__name__] = FixSignature(reads, writes, requires)
     return f
 
 
+def get_signature(name):
+    return roscompile_signatures.get(name, FixSignature())
+
+
+def run_function(name, package, **kwargs):
+    """Run the named roscompile function on the package, measuring it if profiling (see ros_introspection.profiler)."""
+    with measure('fix', name, package.root):
+        return roscompile_functions[name](package, **kwargs)
+
+
 def get_ignore_data_helper(basename, add_newline=True):
     fn = os.path.join(PKG_PATH, 'data', basename + '.ignore')
     lines = []
@@ -45,8 +101,7 @@ def get_ignore_data(name, variables=None, add_newline=True):
 
 
 def make_executable(fn):
-    existing_permissions = stat.S_IMODE(os.lstat(fn).st_mode)
-    os.chmod(fn, existing_permissions | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    set_mode(fn, get_mode(fn) | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
 
 
 def make_not_executable(fn):
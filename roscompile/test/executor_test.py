@@ -0,0 +1,57 @@
+import os
+
+from ros_introspection.package_crawler import crawl
+
+from roscompile.executor import run_in_parallel
+from roscompile.zipfile_interface import ROSCompilePackageFiles
+
+PACKAGE_XML = """<?xml version="1.0"?>
+<package format="2">
+  <name>{0}</name>
+  <version>0.0.0</version>
+  <description>The {0} package</description>
+  <maintainer email="someone@example.com">Someone</maintainer>
+  <license>BSD</license>
+  <buildtool_depend>catkin</buildtool_depend>
+</package>
+"""
+
+CMAKE = """cmake_minimum_required(VERSION 2.8.3)
+project({0})
+find_package(catkin REQUIRED)
+catkin_package()
+add_executable({0}_node src/main.cpp)
+"""
+
+WORKSPACE = {'broken/package.xml': PACKAGE_XML.format('broken'),
+             'broken/CMakeLists.txt': 'project(broken\n'}
+for name in ['alpha', 'beta', 'gamma']:
+    WORKSPACE[name + '/package.xml'] = PACKAGE_XML.format(name)
+    WORKSPACE[name + '/CMakeLists.txt'] = CMAKE.format(name)
+    WORKSPACE[name + '/src/main.cpp'] = '#include <ros/ros.h>\nint main() {}\n'
+
+
+def run_workspace(jobs, capsys):
+    """Fix the packages in WORKSPACE with the given number of jobs.
+
+    Returns the results, the captured output and the contents of the files afterwards.
+    """
+    with ROSCompilePackageFiles('roscompile_executor_test', WORKSPACE, set()) as workspace:
+        results = [(os.path.relpath(root, workspace.root),
+                    sorted(os.path.relpath(path, workspace.root) for path in written), error is not None)
+                   for root, written, error in run_in_parallel(crawl(workspace.root), jobs=jobs)]
+        files = {fn: workspace.get_contents(fn) for fn in workspace.get_filenames()}
+        return results, capsys.readouterr(), files
+
+
+def test_jobs_give_the_same_results(capsys):
+    serial_results, serial_output, serial_files = run_workspace(1, capsys)
+    parallel_results, parallel_output, parallel_files = run_workspace(2, capsys)
+
+    assert [(root, failed) for root, written, failed in serial_results] == [
+        ('alpha', False), ('beta', False), ('broken', True), ('gamma', False)]
+    assert any(written for root, written, failed in serial_results)
+    assert 'Trouble' in serial_output.err
+    assert serial_results == parallel_results
+    assert serial_output == parallel_output
+    assert serial_files == parallel_files
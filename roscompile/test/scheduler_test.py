@@ -0,0 +1,40 @@
+import pytest
+
+from roscompile.scheduler import get_waves, has_required_parts
+from roscompile.util import FixSignature, roscompile_signatures
+
+
+class FakePackage:
+    def __init__(self, cmake=None, launches=()):
+        self.manifest = 'package.xml'
+        self.cmake = cmake
+        self.launches = list(launches)
+
+
+def test_signature_parts():
+    FixSignature(reads=['manifest', 'files'], writes=['files'], requires=['manifest', 'cmake'])
+    with pytest.raises(ValueError):
+        FixSignature(reads=['not_a_part'])
+    # Required parts are checked with getattr(package, part), which 'files' is not
+    with pytest.raises(ValueError):
+        FixSignature(reads=['files'], requires=['files'])
+
+
+def test_scheduling():
+    signatures = {'fix_cmake': FixSignature(reads=['cmake'], writes=['cmake'], requires=['cmake']),
+                  'fix_manifest': FixSignature(reads=['manifest'], writes=['manifest']),
+                  'check_cmake': FixSignature(reads=['cmake', 'files'], writes=['files'], requires=['cmake']),
+                  'fix_launches': FixSignature(reads=['launches'], writes=['launches'], requires=['launches'])}
+    roscompile_signatures.update(signatures)
+    try:
+        assert get_waves(['fix_cmake', 'fix_manifest', 'check_cmake', 'fix_launches']) == [
+            ['fix_cmake', 'fix_manifest', 'fix_launches'], ['check_cmake']]
+
+        assert not has_required_parts(FakePackage(), 'fix_cmake')
+        assert has_required_parts(FakePackage(cmake='CMakeLists.txt'), 'fix_cmake')
+        assert not has_required_parts(FakePackage(cmake='CMakeLists.txt'), 'fix_launches')
+        assert has_required_parts(FakePackage(launches=['a.launch']), 'fix_launches')
+        assert has_required_parts(FakePackage(), 'fix_manifest')
+    finally:
+        for name in signatures:
+            del roscompile_signatures[name]